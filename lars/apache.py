@@ -121,10 +121,12 @@ from __future__ import (
     )
 
 import re
+import locale
 import warnings
 import logging
 import functools
 
+from lars.cache import lru_cache
 from . import parsers, datatypes as dt
 from .strptime import TimeRE, _strptime_datetime
 from .timezone import timedelta, timezone
@@ -178,6 +180,20 @@ class EnglishLocaleTime(object):
 
 
 _STRING_PARSE_RE = re.compile(r'\\(x[0-9a-fA-F]{2}|[^x])')
+_STRING_PARSE_WHITESPACE = {
+    '\\n': '\n',
+    '\\t': '\t',
+    '\\f': '\f',
+    }
+
+
+def _string_unescape(match):
+    # pylint: disable=missing-docstring
+    match = match.group(0)
+    if match.startswith('\\x'):
+        return chr(int(match[2:4], base=16))
+    else:
+        return _STRING_PARSE_WHITESPACE.get(match, match[-1])
 
 
 def _string_parse(s):
@@ -195,21 +211,11 @@ def _string_parse(s):
     """
     if s == '-':
         return None
-    whitespace = {
-        '\\n': '\n',
-        '\\t': '\t',
-        '\\f': '\f',
-        }
-
-    def unescape(match):
-        # pylint: disable=missing-docstring
-        match = match.group(0)
-        if match.startswith('\\x'):
-            return chr(int(match[2:4], base=16))
-        else:
-            return whitespace.get(match, match[-1])
-
-    return _STRING_PARSE_RE.sub(unescape, s)
+    if '\\' not in s:
+        # The vast majority of strings contain no escapes at all, in which
+        # case there's no need to involve the regex engine
+        return s
+    return _STRING_PARSE_RE.sub(_string_unescape, s)
 
 
 def _time_parse_format(s, fmt):
@@ -224,10 +230,23 @@ def _time_parse_format(s, fmt):
     :param str fmt: The strptime format the string must conform to
     :returns: A naive :class:`~lars.datatypes.DateTime` object
     """
+    return _time_parse_locale(s, fmt, locale.getlocale(locale.LC_TIME))
+
+
+# Timestamps only have a resolution of a second, so busy logs contain runs of
+# identical timestamps; a small cache is enough to catch these. Custom formats
+# can contain locale-dependent names (%a, %b, etc.) so the time locale is
+# included in the key
+@lru_cache(maxsize=256)
+def _time_parse_locale(s, fmt, time_locale):
+    # pylint: disable=missing-docstring,unused-argument
     tstamp = _strptime_datetime(dt.DateTime, s, fmt)
     return dt.DateTime(*(tstamp.utctimetuple()[:6] + (tstamp.microsecond,)))
 
 
+# The standard format is always English (see ApacheSource._generate_parser)
+# so, unlike the above, the locale needn't be part of the key
+@lru_cache(maxsize=256)
 def _time_parse_common(s):
     """
     Parse a time in Apache's standard format in an Apache log file.
@@ -462,7 +481,7 @@ class ApacheSource(object):
         self.log_format = log_format
         self.count = 0
         self._row_pattern = None
-        self._row_funcs = None
+        self._row_parser = None
         self._row_type = None
         self._parse_log_format()
 
@@ -561,10 +580,14 @@ class ApacheSource(object):
         # Apache escapes non-printable and "special" chars with hex (\xhh)
         # sequences, except for newline, tab, and double-quote which are all
         # simply back-slash escaped. This is Apache specific and hence isn't
-        # taken from the standard parsers module
+        # taken from the standard parsers module. The pattern is "unrolled"
+        # (runs of ordinary chars between escapes) as an alternation repeated
+        # for every char is dramatically slower, especially when unquoted
+        # fields like %l and %u have to backtrack
         'string':    (_string_parse,
                       r'(?P<%(name)s>'
-                      r'(?:[^\x00-\x1f\x7f\\"]|\\x[0-9a-fA-F]{2}|\\[^x])*|-)'),
+                      r'[^\x00-\x1f\x7f\\"]*'
+                      r'(?:\\(?:x[0-9a-fA-F]{2}|[^x])[^\x00-\x1f\x7f\\"]*)*|-)'),
         # Apache field type which indicates the keep-alive state of the
         # connection when the request is done (X=connection aborted before
         # completion, +=keep connection alive, -=close connection)
@@ -576,9 +599,22 @@ class ApacheSource(object):
     }
 
     def _parse_log_format(self):
-        self._row_funcs = []
-        self._row_type = None
+        # Constructing the row regex and parser is relatively expensive
+        # (especially for custom time formats) while only a handful of distinct
+        # formats are ever used, so the result is cached by class and format.
+        # The time locale is included in the key as the regexes generated for
+        # custom time formats depend upon it
+        (
+            self._row_pattern, self._row_type, self._row_parser
+        ) = self._compile_log_format(
+            self.log_format, locale.getlocale(locale.LC_TIME))
+
+    @classmethod
+    @lru_cache(maxsize=32)
+    def _compile_log_format(cls, log_format, time_locale):
+        # pylint: disable=unused-argument
         tuple_fields = []
+        tuple_funcs = []
         # re.split() returns (when given a pattern with a matching group) a
         # list composed of [str, sep, str, sep, str, ...]. However, our pattern
         # is actually intended to match format strings rather than separators
@@ -587,12 +623,12 @@ class ApacheSource(object):
         # True below
         separator = True
         row_pattern = ''
-        for s in self.FIELD_RE1.split(self.log_format):
+        for s in cls.FIELD_RE1.split(log_format):
             if s:
                 if separator:
                     row_pattern += re.escape(s)
                 else:
-                    name, pattern, parser = self._parse_log_field(s)
+                    name, pattern, parser = cls._parse_log_field(s)
                     if name in tuple_fields:
                         # This can happen if someone's stupid enough to, say,
                         # include %B and %b in a format string. If we actually
@@ -601,22 +637,26 @@ class ApacheSource(object):
                         raise ValueError('Duplicate row field name %s' % name)
                     tuple_fields.append(name)
                     row_pattern += pattern
-                    self._row_funcs.append(parser)
+                    tuple_funcs.append(parser)
             separator = not separator
         # IGNORECASE is required for the time format which needs
         # case-insensitive matching on abbreviated or full weekday or month
         # names
         logging.debug('Constructing row regex: %s', row_pattern)
-        self._row_pattern = re.compile(row_pattern, re.IGNORECASE)
+        row_pattern = re.compile(row_pattern, re.IGNORECASE)
         logging.debug('Constructing row tuple with fields: %s',
                       ','.join(tuple_fields))
-        self._row_type = dt.row(*tuple_fields)
+        row_type, row_parser = parsers.row_parser(
+            tuple(tuple_fields), tuple(tuple_funcs),
+            tuple(row_pattern.groupindex[name] for name in tuple_fields))
+        return row_pattern, row_type, row_parser
 
-    def _parse_log_field(self, s):
+    @classmethod
+    def _parse_log_field(cls, s):
         # This function parses a single %{field}s in an Apache LogFormat
         # string; it is called by _parse_log_format which handles splitting up
         # the LogFormat into individual segments
-        match = self.FIELD_RE2.match(s)
+        match = cls.FIELD_RE2.match(s)
         if match:
             data, suffix = match.group('field'), match.group('suffix')
         else:
@@ -627,14 +667,15 @@ class ApacheSource(object):
             data = data[1:-1]
         try:
             # General case: simple lookup to determine field name
-            template, field_type = self.FIELD_DEFS[suffix]
+            template, field_type = cls.FIELD_DEFS[suffix]
         except KeyError:
             raise ValueError('Invalid format suffix "%s"' % suffix)
-        name, pattern, parser = self._generate_parser(
+        name, pattern, parser = cls._generate_parser(
             data, field_type, _generate_name(template, data, suffix))
         return name, pattern, parser
 
-    def _generate_parser(self, data, field_type, field_name):
+    @classmethod
+    def _generate_parser(cls, data, field_type, field_name):
         if field_type == 'time':
             # Special case: time
             if data:
@@ -686,13 +727,8 @@ class ApacheSource(object):
             parser, pattern = parsers.url_parse, parsers.URL
         else:
             # General case: just lookup the parser and pattern in the class'
-            # TYPES dictionary and construct an identity function if there's
-            # no parser
-            parser, pattern = self.TYPES[field_type]
-            if parser is None:
-                def parser(s):
-                    # pylint: disable=missing-docstring
-                    return s
+            # TYPES dictionary; a parser of None leaves the field as a string
+            parser, pattern = cls.TYPES[field_type]
         return field_name, pattern % {'name': field_name}, parser
 
     def __enter__(self):
@@ -721,19 +757,18 @@ class ApacheSource(object):
         performed by the regular expressions and tuple class set up in the
         initializer above.
         """
+        row_match = self._row_pattern.match
+        row_parser = self._row_parser
         for num, line in enumerate(self.source):
             try:
-                match = self._row_pattern.match(line.rstrip())
+                match = row_match(line.rstrip())
                 if match:
-                    values = match.group(*self._row_type._fields)
                     try:
-                        values = [
-                            f(v) for (f, v) in zip(self._row_funcs, values)
-                        ]
+                        row = row_parser(match)
                     except ValueError as exc:
                         raise ApacheWarning(str(exc))
                     self.count += 1
-                    yield self._row_type(*values)
+                    yield row
                 else:
                     raise ApacheWarning('Line contains invalid data')
             except ApacheWarning as exc:
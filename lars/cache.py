@@ -23,7 +23,9 @@
 """
 This module provides a backport of the Python 3.3 LRU caching decorator. Users
 should never need to access this module directly; its contents are solely
-present to ensure DNS lookups can be cached under a Python 2.7 environment.
+present to ensure lookups can be cached under a Python 2.7 environment. Where
+the standard library provides :func:`functools.lru_cache`, this module exports
+that instead.
 
 Source adapted from `Raymond Hettinger's recipe`_ licensed under the `MIT
 license`_.
@@ -225,3 +227,15 @@ def lru_cache(maxsize=100, typed=False):
         return update_wrapper(wrapper, user_function)
 
     return decorating_function
+
+
+# Prefer the standard library's implementation (which is written in C from
+# Python 3.5 onwards) where it exists; all modules in the package import
+# lru_cache from here so this is the only place the choice is made. The
+# backport remains available under a private name so it can be tested on all
+# versions
+_backport_lru_cache = lru_cache
+try:
+    from functools import lru_cache  # pylint: disable=ungrouped-imports
+except ImportError:
+    pass
@@ -201,6 +201,7 @@ class CSVTarget(object):
         self.keywords = kwargs
         self.count = 0
         self._first_row = None
+        self._row_len = None
         # The csv writer outputs strings so we stick a transcoding shim between
         # the writer and the output object
         self._writer = csv_.writer(
@@ -223,6 +224,7 @@ class CSVTarget(object):
         logging.debug('Closing CSV target')
         self._writer = None
         self._first_row = None
+        self._row_len = None
 
     def write(self, row):
         """
@@ -231,12 +233,13 @@ class CSVTarget(object):
         need to convert elements of the tuple to :class:`str`; this will be
         handled implicitly.
         """
-        if self._first_row:
-            if len(row) != len(self._first_row):
+        if self._first_row is not None:
+            if len(row) != self._row_len:
                 raise TypeError('Rows must have the same number of elements')
         else:
             logging.debug('First row')
             self._first_row = row
+            self._row_len = len(row)
             if self.header and hasattr(row, '_fields'):
                 # XXX What if it doesn't have any _fields?
                 logging.debug('Writing header row')
@@ -96,6 +96,18 @@ Functions
 .. autofunction:: url
 
 
+Constants
+=========
+
+.. data:: LOCALHOST
+
+    The :class:`Hostname` "localhost"
+
+.. data:: LOCALHOST_DOMAIN
+
+    The :class:`Hostname` "localhost.localdomain"
+
+
 .. _RFC 1918: http://tools.ietf.org/html/rfc1918
 .. _RFC 2373 2.5.2: http://tools.ietf.org/html/rfc2373#section-2.5.2
 .. _RFC 2373 2.5.3: http://tools.ietf.org/html/rfc2373#section-2.5.3
@@ -130,13 +142,21 @@ from .ipaddress import (  # noqa: F401
     Hostname,
     IPv4Address, IPv6Address,
     IPv4Network, IPv6Network,
-    IPv4Port, IPv6Port)
+    IPv4Port, IPv6Port,
+    LOCALHOST, LOCALHOST_DOMAIN)
 from .url import path, url, request, Path, Url, Request  # noqa: F401
 
 native_str = str  # pylint: disable=invalid-name
 str = type('')  # pylint: disable=redefined-builtin,invalid-name
 
 
+# Identifiers must start with a letter or underscore; thereafter digits are
+# permitted too. Runs of invalid characters are collapsed to a single
+# underscore (which is why this isn't done with str.translate)
+_SANITIZE_FIRST_RE = re.compile(r'[^A-Za-z_]')
+_SANITIZE_REST_RE = re.compile(r'[^A-Za-z0-9_]+')
+
+
 def sanitize_name(name):
     """
     Sanitizes the given name for use as a Python identifier.
@@ -147,8 +167,8 @@ def sanitize_name(name):
     if name == '':
         raise ValueError('Cannot sanitize a blank string')
     return (
-        re.sub(r'[^A-Za-z_]', '_', name[:1]) +
-        re.sub(r'[^A-Za-z0-9_]+', '_', name[1:])
+        _SANITIZE_FIRST_RE.sub('_', name[:1]) +
+        _SANITIZE_REST_RE.sub('_', name[1:])
     )
 
 
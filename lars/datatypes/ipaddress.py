@@ -43,6 +43,7 @@ from __future__ import (
     )
 
 import re
+import weakref
 from functools import total_ordering
 try:
     import ipaddress
@@ -55,6 +56,12 @@ from lars import geoip
 native_str = str  # pylint: disable=invalid-name
 str = type('')  # pylint: disable=redefined-builtin,invalid-name
 
+# Hostnames (and methods, which IIS logs as hostnames) repeat enormously within
+# a log file. This pool permits all live Hostname instances with the same value
+# to share a single object (and skip re-validation) while still permitting
+# unused instances to be garbage collected
+_HOSTNAME_POOL = weakref.WeakValueDictionary()
+
 
 def hostname(s):
     """
@@ -68,14 +75,20 @@ def hostname(s):
     """
     if isinstance(s, bytes):
         s = s.decode('utf-8')
-    try:
-        return IPv4Address(s)
-    except ValueError:
-        pass
-    try:
-        return IPv6Address(s)
-    except ValueError:
-        pass
+    # Only try the address classes when the string could possibly be one;
+    # raising and catching their exceptions is far more expensive than these
+    # checks. Every IPv6 address contains a colon (which no hostname can) and
+    # every IPv4 address ends with a digit (which no TLD can)
+    if ':' in s:
+        try:
+            return IPv6Address(s)
+        except ValueError:
+            pass
+    elif s[-1:].isdigit():
+        try:
+            return IPv4Address(s)
+        except ValueError:
+            pass
     return Hostname(s)
 
 
@@ -90,11 +103,10 @@ def network(s):
     if isinstance(s, bytes):
         s = s.decode('utf-8')
     try:
-        return IPv4Network(s)
-    except ValueError:
-        pass
-    try:
-        return IPv6Network(s)
+        if ':' in s:
+            return IPv6Network(s)
+        else:
+            return IPv4Network(s)
     except ValueError:
         pass
     raise ValueError(
@@ -112,20 +124,21 @@ def address(s):
     """
     if isinstance(s, bytes):
         s = s.decode('utf-8')
+    # The form of the string determines the only class that could accept it,
+    # which avoids raising (and catching) an exception for each class that
+    # can't: no colon means a plain IPv4 address, a leading bracket an IPv6
+    # address with optional port, a single colon an IPv4 address and port,
+    # and anything else a plain IPv6 address
+    if ':' not in s:
+        cls = IPv4Address
+    elif s.startswith('['):
+        cls = IPv6Port
+    elif s.count(':') == 1:
+        cls = IPv4Port
+    else:
+        cls = IPv6Address
     try:
-        return IPv4Address(s)
-    except ValueError:
-        pass
-    try:
-        return IPv6Address(s)
-    except ValueError:
-        pass
-    try:
-        return IPv4Port(s)
-    except ValueError:
-        pass
-    try:
-        return IPv6Port(s)
+        return cls(s)
     except ValueError:
         pass
     raise ValueError(
@@ -144,17 +157,33 @@ class Hostname(str):
     :param str hostname: The hostname to parse
     """
 
-    name_part_re = re.compile(r'^[a-zA-Z0-9]([a-zA-Z0-9-]{0,61}[a-zA-Z0-9])?$',
-                              flags=re.UNICODE)
-
-    def __init__(self, s):
+    # Note that these are anchored with \Z rather than $ which would also
+    # permit a trailing newline
+    name_part_re = re.compile(
+        r'^[a-zA-Z0-9]([a-zA-Z0-9-]{0,61}[a-zA-Z0-9])?\Z', flags=re.UNICODE)
+    # The same label pattern repeated across the entire name; this validates
+    # the whole name in a single pass of the regex engine, leaving the
+    # per-label check above for generating a useful error message
+    name_re = re.compile(
+        r'^[a-zA-Z0-9]([a-zA-Z0-9-]{0,61}[a-zA-Z0-9])?'
+        r'(\.[a-zA-Z0-9]([a-zA-Z0-9-]{0,61}[a-zA-Z0-9])?)*\Z',
+        flags=re.UNICODE)
+
+    def __new__(cls, s):
+        try:
+            return _HOSTNAME_POOL[s]
+        except KeyError:
+            pass
         if len(s) > 255:
-            raise ValueError('DNS name %s is longer than 255 chars' % hostname)
-        for part in s.split('.'):
-            # XXX What about IPv6 addresses? Check with address_parse?
-            if not self.name_part_re.match(part):
-                raise ValueError('DNS label %s is invalid' % part)
-        super(Hostname, self).__init__()
+            raise ValueError('DNS name %s is longer than 255 chars' % s)
+        if not cls.name_re.match(s):
+            for part in s.split('.'):
+                # XXX What about IPv6 addresses? Check with address_parse?
+                if not cls.name_part_re.match(part):
+                    raise ValueError('DNS label %s is invalid' % part)
+        result = super(Hostname, cls).__new__(cls, s)
+        _HOSTNAME_POOL[s] = result
+        return result
 
     @property
     def address(self):
@@ -170,6 +199,13 @@ class Hostname(str):
             return address(ipaddr)
 
 
+# The loopback names are the usual result of reverse resolving 127.0.0.1 and
+# ::1 and are frequently compared against; keeping a reference to them here
+# pins them in the pool so any hostname('localhost') call is a cache hit
+LOCALHOST = Hostname('localhost')
+LOCALHOST_DOMAIN = Hostname('localhost.localdomain')
+
+
 class IPv4Address(ipaddress.IPv4Address):
     # pylint: disable=too-many-ancestors
     """
@@ -597,13 +633,15 @@ class IPv4Port(IPv4Address):
 
     def __init__(self, address):
         # pylint: disable=redefined-outer-name
-        port = None
-        if ':' in address:
-            address, port = address.rsplit(':', 1)
+        addr, sep, port = address.rpartition(':')
+        if sep:  # IPv4addr:port
             port = int(port)
             if not 0 <= port <= 65535:
                 raise ValueError('Invalid port %d' % port)
-        super(IPv4Port, self).__init__(address)
+        else:  # IPv4addr
+            addr = port
+            port = None
+        super(IPv4Port, self).__init__(addr)
         self.port = port
 
     def __str__(self):
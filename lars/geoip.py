@@ -40,6 +40,8 @@ Functions
 
 .. autofunction:: init_databases
 
+.. autofunction:: close_databases
+
 .. autofunction:: country_code_by_addr
 
 .. autofunction:: city_by_addr
@@ -65,13 +67,24 @@ from __future__ import (
     division,
     )
 
+import os
 from collections import namedtuple
+try:
+    from sys import intern
+except ImportError:
+    intern = None  # pylint: disable=invalid-name
 try:
     import ipaddress
 except ImportError:
     import ipaddr as ipaddress
 
 import pygeoip
+try:
+    import maxminddb
+except ImportError:
+    maxminddb = None
+
+from lars.cache import lru_cache
 
 str = type('')  # pylint: disable=redefined-builtin,invalid-name
 
@@ -83,15 +96,202 @@ _GEOIP_IPV4_ORG = None
 _GEOIP_IPV6_GEO = None
 _GEOIP_IPV6_ISP = None
 _GEOIP_IPV6_ORG = None
+_DATABASES = {}
 
 
 GeoCoord = namedtuple('GeoCoord', ('longitude', 'latitude'))
 
 
+# Python 2's intern() builtin only accepts byte-strings, so we fall back to
+# this pool for unicode results. The LRU cache returns the first of any equal
+# strings it has stored, while its bound ensures rarely seen values don't
+# accumulate for the life of the process
+@lru_cache(maxsize=4096)
+def _intern_pool(s):
+    # pylint: disable=missing-docstring
+    return s
+
+
+if intern is None:
+    intern = _intern_pool  # pylint: disable=invalid-name
+
+
+def _decode(result):
+    # pygeoip returns '' or None in the case a match isn't found; for
+    # consistency we always convert this to None. Country codes, regions,
+    # cities, ISPs, and organisations have a tiny cardinality compared to the
+    # number of rows in a typical log file, so we intern the results to ensure
+    # every row referencing the same value shares a single string object
+    if not result:
+        return None
+    if not isinstance(result, str):
+        result = result.decode(_MAXMIND_ENCODING)
+    return intern(result)
+
+
+# Addresses repeat heavily in real logs, and each pygeoip query walks the
+# database tree (from disk unless cached in memory), so we cache raw query
+# results keyed on the database, the method, and the address. The address is
+# keyed by its version and integer value, so the (relatively expensive)
+# string conversion only occurs on a cache miss. Keying on the database
+# ensures init_databases (which also clears the cache) never yields stale
+# results
+@lru_cache(maxsize=65536)
+def _query(db, method, version, address):
+    """
+    Call *method* of the GeoIP database *db* with the string form of the
+    IPv4 or IPv6 (depending on *version*) address with integer value
+    *address*, caching the result.
+    """
+    if version == 4:
+        address = ipaddress.IPv4Address(address)
+    else:
+        address = ipaddress.IPv6Address(address)
+    return getattr(db, method)(str(address))
+
+
+def _lookup(db, method, address):
+    """
+    Call *method* of the GeoIP database *db* with the string form of
+    *address* (excluding any port), caching the result.
+    """
+    # The version is required as small IPv6 addresses share their integer
+    # values with IPv4 addresses. Using the integer value also means that
+    # IPv4Port and IPv6Port (the string conversion of which includes a port
+    # the databases wouldn't understand) are looked up by their bare address
+    return _query(db, method, address.version, int(address))
+
+
+class _MaxMindDatabase(object):
+    """
+    Wraps a MaxMind DB (``.mmdb``) reader to provide the subset of the
+    :class:`pygeoip.GeoIP` API used by this module.
+
+    :param str filename: The filename of the database to open
+    :param int flags: The pygeoip caching flags the database was requested with
+    :param str org_key: The record key returned by :meth:`org_by_addr`
+    """
+
+    def __init__(self, filename, flags, org_key):
+        if maxminddb is None:
+            raise ImportError(
+                'The maxminddb package is required to open %s' % filename)
+        # The C extension (where available) only operates on memory-mapped
+        # databases; MODE_AUTO selects it, falling back to the pure Python
+        # mmap reader. As the OS page cache keeps the mapping in RAM this
+        # suffices for MEMORY_CACHE too
+        if flags == pygeoip.STANDARD:
+            mode = maxminddb.MODE_FILE
+        else:
+            mode = maxminddb.MODE_AUTO
+        self._reader = maxminddb.open_database(filename, mode)
+        self._org_key = org_key
+
+    def close(self):
+        """
+        Close the underlying reader, releasing its file handle or mapping.
+        """
+        self._reader.close()
+
+    def _get(self, address):
+        return self._reader.get(address) or {}
+
+    def country_code_by_addr(self, address):
+        # pylint: disable=missing-docstring
+        return self._get(address).get('country', {}).get('iso_code')
+
+    def region_by_addr(self, address):
+        # pylint: disable=missing-docstring
+        rec = self._get(address)
+        if rec.get('subdivisions'):
+            return {
+                'region_name': rec['subdivisions'][0]['names'].get('en'),
+                }
+        return {}
+
+    def record_by_addr(self, address):
+        # pylint: disable=missing-docstring
+        rec = self._get(address)
+        if rec:
+            result = {
+                'city': rec.get('city', {}).get('names', {}).get('en'),
+                }
+            # Some records (e.g. anonymous proxies) have no location; omit
+            # the coordinates entirely so coords_by_addr returns None
+            location = rec.get('location', {})
+            if (
+                    location.get('longitude') is not None and
+                    location.get('latitude') is not None):
+                result['longitude'] = location['longitude']
+                result['latitude'] = location['latitude']
+            return result
+
+    def org_by_addr(self, address):
+        # pylint: disable=missing-docstring
+        rec = self._get(address)
+        # Fall back to the organisation name in ASN databases
+        return rec.get(
+            self._org_key, rec.get('autonomous_system_organization'))
+
+
+def _open_database(filename, flags, org_key='organization'):
+    # Opening a database (particularly with MEMORY_CACHE) can be expensive, so
+    # databases are shared between calls to init_databases provided the file
+    # hasn't been modified in the meantime. The modification time is stored
+    # alongside the database rather than in the key so that a modified file
+    # replaces its prior entry instead of accumulating beside it. Files we
+    # can't stat aren't cached; opening them will presumably fail anyway
+    try:
+        key = (os.path.realpath(filename), flags, org_key)
+        mtime = os.stat(filename).st_mtime
+    except OSError:
+        key = mtime = None
+    try:
+        cached_mtime, result = _DATABASES[key]
+    except KeyError:
+        pass
+    else:
+        if cached_mtime == mtime:
+            return result
+    # MaxMind DB files are recognized by their extension; anything else is
+    # assumed to be a legacy GeoIP database
+    if filename.endswith('.mmdb'):
+        result = _MaxMindDatabase(filename, flags, org_key)
+    else:
+        result = pygeoip.GeoIP(filename, flags)
+    if key is not None:
+        _DATABASES[key] = (mtime, result)
+    return result
+
+
+def _referenced_databases():
+    """
+    Returns a list of all databases currently referenced by the module.
+    """
+    return [db for (_, db) in _DATABASES.values()] + [
+        _GEOIP_IPV4_GEO, _GEOIP_IPV4_ISP, _GEOIP_IPV4_ORG,
+        _GEOIP_IPV6_GEO, _GEOIP_IPV6_ISP, _GEOIP_IPV6_ORG]
+
+
+def _close_databases(databases):
+    """
+    Closes each of the specified *databases*, ignoring duplicates.
+    """
+    # The same database may be referenced several times (by the globals and
+    # the re-use cache) so take care to close each only once. MaxMind DB
+    # readers can be closed explicitly; pygeoip provides no means of doing so
+    # so we simply drop our references to those
+    closed = set()
+    for db in databases:
+        if isinstance(db, _MaxMindDatabase) and id(db) not in closed:
+            closed.add(id(db))
+            db.close()
+
+
 def init_databases(
         v4_geo_filename=None, v4_isp_filename=None, v4_org_filename=None,
         v6_geo_filename=None, v6_isp_filename=None, v6_org_filename=None,
-        memcache=True):
+        memcache=True, mmap=False):
     # pylint: disable=too-many-arguments,global-statement
     """
     Initializes the global GeoIP database instances in a thread-safe manner.
@@ -117,6 +317,28 @@ def init_databases(
     sufficient RAM for this), but this behaviour can be overridden with the
     *memcache* parameter.
 
+    Databases may be in the legacy GeoIP (``.dat``) format, or the newer
+    MaxMind DB (``.mmdb``) format, such as the GeoLite2 databases. The latter
+    are recognized by their extension and require the optional `maxminddb`_
+    package; where its C extension is available, lookups in these databases are
+    considerably faster.
+
+    When processing logs with several worker processes (e.g. a
+    :class:`multiprocessing.Pool`), caching the database in each worker
+    multiplies its memory footprint by the number of workers. In this case,
+    specify *mmap* instead; the database file(s) will be memory-mapped so that
+    all workers share the operating system's page cache, and nothing is read
+    until the first lookup. As the mapping is read-only, no synchronization
+    between workers is required. Simply pass this function as the pool's
+    *initializer*::
+
+        from functools import partial
+        from multiprocessing import Pool
+        from lars import geoip
+
+        pool = Pool(initializer=partial(
+            geoip.init_databases, 'GeoLiteCity.dat', mmap=True))
+
     .. warning::
 
         At the time of writing, the free GeoLite IPv6 city-level database does
@@ -144,6 +366,12 @@ def init_databases(
 
     :param bool memcache:
         Set to False if you don't wish to cache the db in RAM (optional)
+
+    :param bool mmap:
+        Set to True to memory-map the db instead of caching it; this takes
+        precedence over *memcache* (optional)
+
+    .. _maxminddb: https://pypi.python.org/pypi/maxminddb/
     """
     global \
         _GEOIP_IPV4_GEO, _GEOIP_IPV4_ISP, _GEOIP_IPV4_ORG, \
@@ -156,24 +384,52 @@ def init_databases(
             v6_isp_filename or
             v6_org_filename):
         raise ValueError('You must call init_database with a database to load')
+    if mmap:
+        flags = pygeoip.MMAP_CACHE
+    elif memcache:
+        flags = pygeoip.MEMORY_CACHE
+    else:
+        flags = pygeoip.STANDARD
+    previous = _referenced_databases()
     if v4_geo_filename:
-        _GEOIP_IPV4_GEO = pygeoip.GeoIP(
-            v4_geo_filename, pygeoip.MEMORY_CACHE if memcache else 0)
+        _GEOIP_IPV4_GEO = _open_database(v4_geo_filename, flags)
     if v4_isp_filename:
-        _GEOIP_IPV4_ISP = pygeoip.GeoIP(
-            v4_isp_filename, pygeoip.MEMORY_CACHE if memcache else 0)
+        _GEOIP_IPV4_ISP = _open_database(v4_isp_filename, flags, 'isp')
     if v4_org_filename:
-        _GEOIP_IPV4_ORG = pygeoip.GeoIP(
-            v4_org_filename, pygeoip.MEMORY_CACHE if memcache else 0)
+        _GEOIP_IPV4_ORG = _open_database(v4_org_filename, flags)
     if v6_geo_filename:
-        _GEOIP_IPV6_GEO = pygeoip.GeoIP(
-            v6_geo_filename, pygeoip.MEMORY_CACHE if memcache else 0)
+        _GEOIP_IPV6_GEO = _open_database(v6_geo_filename, flags)
     if v6_isp_filename:
-        _GEOIP_IPV6_ISP = pygeoip.GeoIP(
-            v6_isp_filename, pygeoip.MEMORY_CACHE if memcache else 0)
+        _GEOIP_IPV6_ISP = _open_database(v6_isp_filename, flags, 'isp')
     if v6_org_filename:
-        _GEOIP_IPV6_ORG = pygeoip.GeoIP(
-            v6_org_filename, pygeoip.MEMORY_CACHE if memcache else 0)
+        _GEOIP_IPV6_ORG = _open_database(v6_org_filename, flags)
+    # Close any databases replaced above (because their file was modified)
+    # which are no longer referenced
+    current = set(id(db) for db in _referenced_databases())
+    _close_databases(db for db in previous if id(db) not in current)
+    _query.cache_clear()
+
+
+def close_databases():
+    # pylint: disable=global-statement
+    """
+    Closes all GeoIP databases opened by :func:`init_databases`.
+
+    Subsequent lookups will raise ValueError until :func:`init_databases` is
+    called again. Note that :func:`init_databases` will re-use databases it has
+    already opened (provided the file hasn't since been modified), so this
+    function is only necessary if you wish to release the memory (and files)
+    used by the databases, or force them to be re-opened.
+    """
+    global \
+        _GEOIP_IPV4_GEO, _GEOIP_IPV4_ISP, _GEOIP_IPV4_ORG, \
+        _GEOIP_IPV6_GEO, _GEOIP_IPV6_ISP, _GEOIP_IPV6_ORG
+    _close_databases(_referenced_databases())
+    _GEOIP_IPV4_GEO = _GEOIP_IPV4_ISP = _GEOIP_IPV4_ORG = None
+    _GEOIP_IPV6_GEO = _GEOIP_IPV6_ISP = _GEOIP_IPV6_ORG = None
+    _DATABASES.clear()
+    _query.cache_clear()
+    _intern_pool.cache_clear()
 
 
 def country_code_by_addr(address):
@@ -194,17 +450,15 @@ def country_code_by_addr(address):
     # consistency with the GeoIP API, we convert this to None
     try:
         if isinstance(address, ipaddress.IPv4Address):
-            result = _GEOIP_IPV4_GEO.country_code_by_addr(address.compressed)
+            result = _lookup(_GEOIP_IPV4_GEO, 'country_code_by_addr', address)
         else:
-            result = _GEOIP_IPV6_GEO.country_code_by_addr(address.compressed)
+            result = _lookup(_GEOIP_IPV6_GEO, 'country_code_by_addr', address)
     except AttributeError:
         raise ValueError(
             'Uninitialized geo database while looking up country '
             'for address %s' % address)
     else:
-        if isinstance(result, str):
-            return result
-        return result.decode(_MAXMIND_ENCODING)
+        return _decode(result)
 
 
 def region_by_addr(address):
@@ -230,18 +484,15 @@ def region_by_addr(address):
     # case of no match
     try:
         if isinstance(address, ipaddress.IPv4Address):
-            rec = _GEOIP_IPV4_GEO.region_by_addr(address.compressed)
+            rec = _lookup(_GEOIP_IPV4_GEO, 'region_by_addr', address)
         else:
-            rec = _GEOIP_IPV6_GEO.region_by_addr(address.compressed)
+            rec = _lookup(_GEOIP_IPV6_GEO, 'region_by_addr', address)
     except AttributeError:
         raise ValueError(
             'Uninitialized geo database while looking up country '
             'for address %s' % address)
     if rec and 'region_name' in rec:
-        result = rec['region_name']
-        if isinstance(result, str):
-            return result
-        return result.decode(_MAXMIND_ENCODING)
+        return _decode(rec['region_name'])
 
 
 def city_by_addr(address):
@@ -263,18 +514,15 @@ def city_by_addr(address):
     """
     try:
         if isinstance(address, ipaddress.IPv4Address):
-            rec = _GEOIP_IPV4_GEO.record_by_addr(address.compressed)
+            rec = _lookup(_GEOIP_IPV4_GEO, 'record_by_addr', address)
         else:
-            rec = _GEOIP_IPV6_GEO.record_by_addr(address.compressed)
+            rec = _lookup(_GEOIP_IPV6_GEO, 'record_by_addr', address)
     except AttributeError:
         raise ValueError(
             'Uninitialized geo database while looking up country '
             'for address %s' % address)
     if rec and 'city' in rec:
-        result = rec['city']
-        if isinstance(result, str):
-            return result
-        return result.decode(_MAXMIND_ENCODING)
+        return _decode(rec['city'])
 
 
 def coords_by_addr(address):
@@ -298,14 +546,14 @@ def coords_by_addr(address):
     """
     try:
         if isinstance(address, ipaddress.IPv4Address):
-            rec = _GEOIP_IPV4_GEO.record_by_addr(address.compressed)
+            rec = _lookup(_GEOIP_IPV4_GEO, 'record_by_addr', address)
         else:
-            rec = _GEOIP_IPV6_GEO.record_by_addr(address.compressed)
+            rec = _lookup(_GEOIP_IPV6_GEO, 'record_by_addr', address)
     except AttributeError:
         raise ValueError(
             'Uninitialized geo database while looking up country '
             'for address %s' % address)
-    if rec:
+    if rec and 'longitude' in rec and 'latitude' in rec:
         return GeoCoord(rec['longitude'], rec['latitude'])
 
 
@@ -324,17 +572,15 @@ def isp_by_addr(address):
     """
     try:
         if isinstance(address, ipaddress.IPv4Address):
-            result = _GEOIP_IPV4_ISP.org_by_addr(address.compressed)
+            result = _lookup(_GEOIP_IPV4_ISP, 'org_by_addr', address)
         else:
-            result = _GEOIP_IPV6_ISP.org_by_addr(address.compressed)
+            result = _lookup(_GEOIP_IPV6_ISP, 'org_by_addr', address)
     except AttributeError:
         raise ValueError(
             'Uninitialized ISP database while looking up ISP '
             'for address %s' % address)
     else:
-        if isinstance(result, str):
-            return result
-        return result.decode(_MAXMIND_ENCODING)
+        return _decode(result)
 
 
 def org_by_addr(address):
@@ -346,14 +592,12 @@ def org_by_addr(address):
     """
     try:
         if isinstance(address, ipaddress.IPv4Address):
-            result = _GEOIP_IPV4_ORG.org_by_addr(address.compressed)
+            result = _lookup(_GEOIP_IPV4_ORG, 'org_by_addr', address)
         else:
-            result = _GEOIP_IPV6_ORG.org_by_addr(address.compressed)
+            result = _lookup(_GEOIP_IPV6_ORG, 'org_by_addr', address)
     except AttributeError:
         raise ValueError(
             'Uninitialized organisation database while looking up org '
             'for address %s' % address)
     else:
-        if isinstance(result, str):
-            return result
-        return result.decode(_MAXMIND_ENCODING)
+        return _decode(result)
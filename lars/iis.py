@@ -142,12 +142,21 @@ try:
 except ImportError:
     from urllib import unquote_plus  # pylint: disable=wrong-import-order
 
+from lars.cache import lru_cache
 from . import parsers, datatypes as dt
 from .exc import LarsError, LarsWarning
 
 str = type('')  # pylint: disable=redefined-builtin,invalid-name
 
+# Log files are ASCII, so under Python 3 we restrict classes like \d and \s to
+# ASCII characters which is both stricter and faster (this is the default
+# behaviour under Python 2)
+_RE_ASCII = getattr(re, 'ASCII', 0)
 
+# String fields (in particular User-Agent) are extremely repetitive in real
+# logs; caching the decoded results avoids re-decoding (and re-allocating) the
+# same handful of values for every row
+@lru_cache(maxsize=10000)
 def _string_parse(s):
     """
     Parse a string in a IIS extended log format file.
@@ -163,6 +172,11 @@ def _string_parse(s):
         return None
     if s[:1] == '"':
         return s[1:-1].replace('""', '"')
+    if '%' not in s:
+        # Most unquoted fields contain no %-escapes, in which case the only
+        # decoding required is of "+" to space; this is far cheaper than
+        # calling unquote_plus
+        return s.replace('+', ' ')
     return unquote_plus(s)
 
 
@@ -244,7 +258,7 @@ class IISSource(object):
         self.fields = []
         self.count = 0
         self._row_pattern = None
-        self._row_funcs = None
+        self._row_parser = None
         self._row_type = None
 
     # The following regexes are used to identify directives within IIS log
@@ -256,22 +270,45 @@ class IISSource(object):
     # it in practice).
 
     VERSION_RE = re.compile(
-        r'^#\s*Version\s*:\s*(?P<text>\d+\.\d+)\s*$', flags=re.IGNORECASE)
+        r'^#\s*Version\s*:\s*(?P<text>\d+\.\d+)\s*$',
+        flags=re.IGNORECASE | _RE_ASCII)
     START_DATE_RE = re.compile(
         r'^#\s*Start-Date\s*:\s*(?P<date>\d{4}-\d{2}-\d{2})\s*'
-        r'(?P<time>\d{2}:\d{2}:\d{2})\s*$', flags=re.IGNORECASE)
+        r'(?P<time>\d{2}:\d{2}:\d{2})\s*$',
+        flags=re.IGNORECASE | _RE_ASCII)
     END_DATE_RE = re.compile(
         r'^#\s*End-Date\s*:\s*(?P<date>\d{4}-\d{2}-\d{2})\s*'
-        r'(?P<time>\d{2}:\d{2}:\d{2})\s*$', flags=re.IGNORECASE)
+        r'(?P<time>\d{2}:\d{2}:\d{2})\s*$',
+        flags=re.IGNORECASE | _RE_ASCII)
     DATE_RE = re.compile(
         r'^#\s*Date\s*:\s*(?P<date>\d{4}-\d{2}-\d{2})\s*'
-        r'(?P<time>\d{2}:\d{2}:\d{2})\s*$', flags=re.IGNORECASE)
+        r'(?P<time>\d{2}:\d{2}:\d{2})\s*$',
+        flags=re.IGNORECASE | _RE_ASCII)
     SOFTWARE_RE = re.compile(
-        r'^#\s*Software\s*:\s*(?P<text>.*)$', flags=re.IGNORECASE)
+        r'^#\s*Software\s*:\s*(?P<text>.*)$',
+        flags=re.IGNORECASE | _RE_ASCII)
     REMARK_RE = re.compile(
-        r'^#\s*Remark\s*:\s*(?P<text>.*)$', flags=re.IGNORECASE)
+        r'^#\s*Remark\s*:\s*(?P<text>.*)$',
+        flags=re.IGNORECASE | _RE_ASCII)
     FIELDS_RE = re.compile(
-        r'^#\s*Fields\s*:\s*(?P<text>.*)$', flags=re.IGNORECASE)
+        r'^#\s*Fields\s*:\s*(?P<text>.*)$',
+        flags=re.IGNORECASE | _RE_ASCII)
+
+    # Rather than trying each of the directive regexes above in turn, the
+    # DIRECTIVE_RE regex extracts the name of the directive which is looked up
+    # in DIRECTIVES to find the directive and the name of the single regex
+    # which must then match the line
+
+    DIRECTIVE_RE = re.compile(r'^#\s*(?P<name>[^:\s]+)\s*:', flags=_RE_ASCII)
+    DIRECTIVES = {
+        'version':    ('Version', 'VERSION_RE'),
+        'software':   ('Software', 'SOFTWARE_RE'),
+        'remark':     ('Remark', 'REMARK_RE'),
+        'fields':     ('Fields', 'FIELDS_RE'),
+        'start-date': ('Start-Date', 'START_DATE_RE'),
+        'end-date':   ('End-Date', 'END_DATE_RE'),
+        'date':       ('Date', 'DATE_RE'),
+        }
 
     # This is, apparently, the date format used by IIS log files. At least,
     # it's the format the draft dictates in the Date and Time sections, but
@@ -296,20 +333,14 @@ class IISSource(object):
         :param str line: The directive line to process
         """
         logging.debug('Parsing directive: %s', line)
-        directive = None
-        for directive, regex in (
-                ('Version', self.VERSION_RE),
-                ('Software', self.SOFTWARE_RE),
-                ('Remar', self.REMARK_RE),
-                ('Fields', self.FIELDS_RE),
-                ('Start-Date', self.START_DATE_RE),
-                ('End-Date', self.END_DATE_RE),
-                ('Date', self.DATE_RE),
-        ):
-            match = regex.match(line)
-            if match:
-                break
+        match = self.DIRECTIVE_RE.match(line)
+        try:
+            directive, regex = self.DIRECTIVES[match.group('name').lower()]
+        except (AttributeError, KeyError):
+            match = None
         else:
+            match = getattr(self, regex).match(line)
+        if not match:
             raise IISDirectiveError('Unrecognized directive %s' %
                                     line.rstrip())
 
@@ -407,8 +438,8 @@ class IISSource(object):
     TYPES = {
         'integer':      (parsers.int_parse, parsers.INTEGER),
         'fixed':        (parsers.fixed_parse, parsers.FIXED),
-        'date_iso':     (parsers.date_parse, parsers.DATE_ISO),
-        'time_iso':     (parsers.time_parse, parsers.TIME_ISO),
+        'date_iso':     (parsers.date_iso_parse, parsers.DATE_ISO),
+        'time_iso':     (parsers.time_iso_parse, parsers.TIME_ISO),
         'url':          (parsers.url_parse, parsers.URL),
         # This regex deviates from the draft's specifications; in practice IIS
         # always URI encodes the content of prefix(header) fields but the draft
@@ -484,12 +515,12 @@ class IISSource(object):
             self.fields.append(original_name)
             tuple_fields.append(python_name)
         logging.debug('Constructing row regex: %s', pattern)
-        self._row_pattern = re.compile('^' + pattern + '$')
+        self._row_pattern = re.compile('^' + pattern + '$', _RE_ASCII)
         logging.debug('Constructing row tuple with fields: %s',
                       ','.join(tuple_fields))
-        self._row_type = dt.row(*tuple_fields)
-        logging.debug('Constructing row parser functions')
-        self._row_funcs = tuple_funcs
+        self._row_type, self._row_parser = parsers.row_parser(
+            tuple(tuple_fields), tuple(tuple_funcs),
+            tuple(self._row_pattern.groupindex[name] for name in tuple_fields))
 
     def __enter__(self):
         logging.debug('Entering IIS context')
@@ -510,10 +541,16 @@ class IISSource(object):
         to encountering the ``#Fields`` directive in :meth:`_process_directive`
         above.
         """
+        # The row regex and parser only change in response to a directive, so
+        # bind them to locals to avoid attribute lookups for every data row
+        row_match = row_parser = None
         for num, line in enumerate(self.source):
             try:
                 if line.startswith('#'):
                     self._process_directive(line.rstrip())
+                    if self._row_pattern is not None:
+                        row_match = self._row_pattern.match
+                        row_parser = self._row_parser
                 elif self.version is None:
                     raise IISVersionError(
                         'Missing #Version directive before data')
@@ -521,16 +558,14 @@ class IISSource(object):
                     raise IISFieldsError(
                         'Missing #Fields directive before data')
                 else:
-                    match = self._row_pattern.match(line.rstrip())
+                    match = row_match(line.rstrip())
                     if match:
-                        values = match.group(*self._row_type._fields)
                         try:
-                            values = [f(v) for (f, v) in zip(self._row_funcs,
-                                                             values)]
+                            row = row_parser(match)
                         except ValueError as exc:
                             raise IISWarning(str(exc))
                         self.count += 1
-                        yield self._row_type(*values)
+                        yield row
                     else:
                         raise IISWarning('Line contains invalid data')
             except IISWarning as exc:
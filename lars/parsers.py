@@ -35,7 +35,10 @@ from __future__ import (
     division,
     )
 
+import logging
+
 from lars import datatypes as dt
+from lars.cache import lru_cache
 
 str = type('')  # pylint: disable=redefined-builtin,invalid-name
 
@@ -108,6 +111,9 @@ ADDRESS_PORT = (
 )
 
 
+# Popular pages mean the same request lines and URLs turn up again and again;
+# the resulting tuples are immutable so cached results can be shared
+@lru_cache(maxsize=4096)
 def request_parse(s):
     """
     Parse an HTTP request line in a log file.
@@ -115,7 +121,7 @@ def request_parse(s):
     This is a basic function that simply returns the three components of a
     request line (method, url, and protocol) as tuple. If URL is "*" (denoting
     a missing URL for methods which do not require one, like OPTIONS), the
-    middle element of the returned tuple will be None.
+    middle element of the returned tuple will be None. Results are cached.
 
     :param str s: The string containing the request line to parse
     :returns: A :class:`~lars.datatypes.Request` tuple representing the
@@ -124,6 +130,7 @@ def request_parse(s):
     return dt.request(s) if s != '-' else None
 
 
+@lru_cache(maxsize=4096)
 def url_parse(s):
     """
     Parse a URL string in a log file.
@@ -132,7 +139,8 @@ def url_parse(s):
     result type has been extended to include a
     :meth:`~lars.datatypes.Url.__str__` method which outputs the
     reconstructed URL, and to have specialized hostname and path properties
-    which return enhanced objects instead of simple strings.
+    which return enhanced objects instead of simple strings. Results are
+    cached.
 
     :param str s: The string containing the URI to parse
     :returns: A :class:`~lars.datatypes.Url` tuple representing the URL
@@ -142,7 +150,8 @@ def url_parse(s):
 
 def path_parse(s):
     """
-    Parse a POSIX-style (slash separated) path string in a log file.
+    Parse a POSIX-style (slash separated) path string in a log file. Results
+    are cached by :func:`~lars.datatypes.path`.
 
     :param str s: The srting containing the POSIX-style path to parse
     :returns: A :class:`~lars.datatypes.Path` object representing the path
@@ -200,9 +209,43 @@ def time_parse(s, format='%H:%M:%S'):
     return dt.time(s, format) if s != '-' else None
 
 
+def date_iso_parse(s):
+    """
+    Parse a date string which has already been matched by :data:`DATE_ISO`.
+
+    As the layout of the string is guaranteed by the regex, the components are
+    simply sliced out of it. This is considerably faster than
+    :func:`date_parse` (which must use strptime).
+
+    :param str s: The string containing the date to parse (YYYY-MM-DD format)
+    :returns: A :class:`~lars.datatypes.Date` object representing the date
+    """
+    if s == '-':
+        return None
+    return dt.Date(int(s[0:4]), int(s[5:7]), int(s[8:10]))
+
+
+def time_iso_parse(s):
+    """
+    Parse a time string which has already been matched by :data:`TIME_ISO`.
+
+    As with :func:`date_iso_parse` the components are sliced out of the string
+    rather than parsed with strptime.
+
+    :param str s: The string containing the time to parse (HH:MM:SS format)
+    :returns: A :class:`~lars.datatypes.Time` object representing the time
+    """
+    if s == '-':
+        return None
+    return dt.Time(int(s[0:2]), int(s[3:5]), int(s[6:8]))
+
+
+# Client hostnames (or addresses, which hostname fields frequently contain)
+# have the same sort of cardinality as client addresses below
+@lru_cache(maxsize=65536)
 def hostname_parse(s):
     """
-    Parse a DNS name in a log format.
+    Parse a DNS name in a log format. Results are cached.
 
     :param str s: The string containing the DNS name to parse
     :returns: A :class:`~lars.datatypes.Hostname` value
@@ -210,11 +253,68 @@ def hostname_parse(s):
     return dt.hostname(s) if s != '-' else None
 
 
+# The same client and server addresses recur throughout a log so plain
+# addresses are cached and shared between rows. Addresses with ports are not:
+# their port attribute can be changed, which would then affect every row
+# sharing the object
+@lru_cache(maxsize=65536)
+def _address_parse(s):
+    return dt.address(s)
+
+
 def address_parse(s):
     """
     Parse an IPv4 or IPv6 address (and optional port) in a log file.
 
+    As addresses tend to recur heavily in logs, results without a port are
+    cached so that repeated addresses return the same object.
+
     :param str s: The string containing the address to parse
     :returns: A :class:`~lars.datatypes.IPv4Address` value
     """
-    return dt.address(s) if s != '-' else None
+    if s == '-':
+        return None
+    # These are the forms which address() parses as IPv6Port and IPv4Port
+    # respectively
+    if s.startswith('[') or s.count(':') == 1:
+        return dt.address(s)
+    return _address_parse(s)
+
+
+# Every source with the same fields needs an identical row parser so we cache
+# the generated parsers (and their row types) by field signature
+@lru_cache(maxsize=100)
+def row_parser(names, funcs, groups):
+    # pylint: disable=exec-used
+    """
+    Generate a function which converts a row match into a row tuple.
+
+    Rather than looping over a list of conversion functions for every field
+    of every row, this generates (and compiles) the source of a function
+    specific to the given fields, in which each conversion is called directly
+    on the relevant match group. A conversion function of None indicates the
+    field's string should be used as is.
+
+    :param tuple names: The Python names of the fields
+    :param tuple funcs: The conversion function for each field
+    :param tuple groups: The index of the match group for each field
+    :returns: A tuple of the row type, and the generated function
+    """
+    row_type = dt.row(*names)
+    # Constructing the row with tuple.__new__ skips the Python-level __new__
+    # of the namedtuple (and its argument unpacking) for every row
+    namespace = {'Row': row_type, 'new': tuple.__new__}
+    args = []
+    for index, (func, group) in enumerate(zip(funcs, groups)):
+        if func is None:
+            args.append('g(%d)' % group)
+        else:
+            namespace['f%d' % index] = func
+            args.append('f%d(g(%d))' % (index, group))
+    source = (
+        'def parse(match):\n'
+        '    g = match.group\n'
+        '    return new(Row, (%s))\n' % ''.join(arg + ', ' for arg in args))
+    logging.debug('Constructing row parser:\n%s', source)
+    exec(compile(source, '<row-parser>', 'exec'), namespace)
+    return row_type, namespace['parse']
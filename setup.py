@@ -98,6 +98,7 @@ __requires__ = [
 __extra_requires__ = {
     'doc': ['sphinx'],
     'test': ['pytest', 'coverage', 'mock'],
+    'mmdb': ['maxminddb'],  # MaxMind DB (GeoIP2) format support
     }
 
 __entry_points__ = {
@@ -0,0 +1,67 @@
+# vim: set et sw=4 sts=4 fileencoding=utf-8:
+#
+# Copyright (c) 2013-2017 Dave Jones <dave@waveform.org.uk>
+# Copyright (c) 2013 Mime Consulting Ltd. <info@mimeconsulting.co.uk>
+# All rights reserved.
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+from __future__ import (
+    unicode_literals,
+    absolute_import,
+    print_function,
+    division,
+    )
+
+import pygeoip
+import pytest
+import mock
+
+from lars import geoip
+
+
+_GEOIP_DBS = (
+    '_GEOIP_IPV4_GEO', '_GEOIP_IPV6_GEO',
+    '_GEOIP_IPV4_ISP', '_GEOIP_IPV6_ISP',
+    '_GEOIP_IPV4_ORG', '_GEOIP_IPV6_ORG',
+    )
+
+@pytest.fixture(scope='session')
+def geoip_db_templates():
+    # Constructing mocks is relatively expensive so we build one (restricted
+    # to the real pygeoip API) for each database once per session
+    return {name: mock.MagicMock(spec=pygeoip.GeoIP) for name in _GEOIP_DBS}
+
+@pytest.fixture
+def geoip_cache():
+    # Ensure the requesting test observes no GeoIP databases or results left
+    # over from a prior test (and leaves none behind); the lookup cache is
+    # keyed on the database object, and the mock databases below are shared
+    # by all tests
+    geoip.close_databases()
+    yield
+    geoip.close_databases()
+
+@pytest.fixture
+def geoip_dbs(geoip_cache, monkeypatch, geoip_db_templates):
+    # Replace all the GeoIP database globals with the (reset) template mocks
+    for name, mock_db in geoip_db_templates.items():
+        mock_db.reset_mock(return_value=True, side_effect=True)
+        monkeypatch.setattr(geoip, name, mock_db)
+    return geoip_db_templates
@@ -30,6 +30,7 @@ from __future__ import (
     )
 
 import pytest
+import mock
 
 from lars import apache, datatypes as dt
 
@@ -84,6 +85,8 @@ def test_string_parse():
     assert apache._string_parse('-') is None
     assert apache._string_parse('') == ''
     assert apache._string_parse('abc') == 'abc'
+    s = 'no escapes here'
+    assert apache._string_parse(s) is s
     assert apache._string_parse('ab\\nc') == 'ab\nc'
     assert apache._string_parse('ab\\x0Ac') == 'ab\nc'
     assert apache._string_parse('foo\\tbar') == 'foo\tbar'
@@ -127,7 +130,22 @@ def test_time_parse_format():
     with pytest.raises(ValueError):
         apache._time_parse_format('[1/Feb/2000:1:3:4 01235]', default)
 
+def test_time_parse_format_locale():
+    # Custom formats depend on the time locale so cached results must not be
+    # shared between locales
+    fmt = '%d/%b/%Y:%H:%M:%S'
+    s = '25/Dec/1998:17:45:35'
+    apache._time_parse_locale.cache_clear()
+    assert apache._time_parse_format(s, fmt) is apache._time_parse_format(s, fmt)
+    assert apache._time_parse_locale.cache_info().misses == 1
+    with mock.patch('lars.apache.locale.getlocale') as getlocale:
+        getlocale.return_value = ('xx_XX', 'UTF-8')
+        apache._time_parse_format(s, fmt)
+    assert apache._time_parse_locale.cache_info().misses == 2
+
 def test_time_parse_common():
+    s = '[25/Dec/1998:17:45:35 +0000]'
+    assert apache._time_parse_common(s) is apache._time_parse_common(s)
     assert apache._time_parse_common('[25/Dec/1998:17:45:35 +0000]') == dt.DateTime(1998, 12, 25, 17, 45, 35)
     assert apache._time_parse_common('[25/Dec/1998:17:45:35 +0100]') == dt.DateTime(1998, 12, 25, 16, 45, 35)
     assert apache._time_parse_common('[4/Dec/2001:23:59:59 -0500]') == dt.DateTime(2001, 12, 5, 4, 59, 59)
@@ -218,6 +236,17 @@ def test_source_combined():
         assert row
         assert count == 1
 
+def test_source_escapes():
+    line = (
+        r'127.0.0.1 - frank [07/Mar/2004:16:56:39 -0800] '
+        r'"GET / HTTP/1.1" 200 10 "-" "Foo \"quoted\" \x41gent\\"' '\n')
+    with apache.ApacheSource([line], log_format=apache.COMBINED) as source:
+        rows = list(source)
+    assert len(rows) == 1
+    assert rows[0].ident is None
+    assert rows[0].remote_user == 'frank'
+    assert rows[0].req_User_Agent == 'Foo "quoted" Agent\\'
+
 def test_source_field_names():
     with apache.ApacheSource(
             EXAMPLE_03.splitlines(True),
@@ -255,6 +284,29 @@ def test_source_date_formats():
         assert row
         assert count == 1
 
+def test_source_shared_format():
+    # Sources with identical log formats share the compiled row regex and
+    # the generated row parser
+    fmt = '%{%Y-%m-%dT%H:%M:%S%z}t %H %m %U%q %>s %O'
+    with apache.ApacheSource(EXAMPLE_04.splitlines(True), fmt) as source1:
+        rows1 = list(source1)
+    with apache.ApacheSource(EXAMPLE_04.splitlines(True), fmt) as source2:
+        rows2 = list(source2)
+    assert source1._row_pattern is source2._row_pattern
+    assert source1._row_parser is source2._row_parser
+    assert rows1 == rows2
+    with apache.ApacheSource('', apache.COMMON) as source3:
+        assert source3._row_pattern is not source1._row_pattern
+
+def test_source_no_fields():
+    # Log formats containing no fields at all still produce (empty) rows
+    with apache.ApacheSource(['foo\n', 'foo\n'], log_format='foo') as source:
+        rows = list(source)
+    assert len(rows) == 2
+    assert rows[0] == () and rows[0]._fields == ()
+    with apache.ApacheSource(['\n'], log_format='') as source:
+        assert list(source) == [()]
+
 def test_source_bad_formats(recwarn):
     with pytest.raises(ValueError):
         with apache.ApacheSource('', log_format='%b %B'):
@@ -34,7 +34,7 @@ import pytest
 from lars import cache
 
 
-@cache.lru_cache(maxsize=5)
+@cache._backport_lru_cache(maxsize=5)
 def double_lru(x):
     return 2 * x
 
@@ -77,3 +77,10 @@ def test_lru_cache():
     assert double_lru('aa') == 'aaaa'
     assert double_lru.cache_info()[:2] == (1, 3)
 
+
+def test_lru_cache_export():
+    try:
+        from functools import lru_cache
+    except ImportError:
+        lru_cache = cache._backport_lru_cache
+    assert cache.lru_cache is lru_cache
@@ -105,6 +105,14 @@ def test_header(rows):
     assert out[2] == b'2002-05-02 20:18:01,172.22.255.255,GET,/images/picture.jpg,0.1,302,16328'
     assert out[3] == b'2002-05-29 12:34:56,9.180.235.203,HEAD,/images/picture.jpg,0.1,202,'
 
+def test_empty_first_row():
+    out = io.BytesIO()
+    with csv.CSVTarget(out) as target:
+        target.write(())
+        with pytest.raises(TypeError):
+            target.write(('foo',))
+    assert target.count == 1
+
 def test_non_unicode(rows):
     # Do it with a non-utf-8 encoding to cover the full transcoding path
     out = io.BytesIO()
@@ -32,6 +32,7 @@ from __future__ import (
 import sys
 import os
 import shutil
+import socket
 import sqlite3
 from datetime import datetime, date, time
 try:
@@ -42,7 +43,12 @@ except ImportError:
 import pytest
 import mock
 
-from lars import datatypes as dt, geoip
+from lars import datatypes as dt, dns, geoip
+
+
+# Loopback addresses shared by the GeoIP attribute tests
+V4_LOCAL = dt.address('127.0.0.1')
+V6_LOCAL = dt.address('::1')
 
 
 INTRANET_EXAMPLE = """\
@@ -77,6 +83,8 @@ def test_sanitize_name():
     assert dt.sanitize_name(' foo ') == '_foo_'
     assert dt.sanitize_name('rs-date') == 'rs_date'
     assert dt.sanitize_name('cs(User-Agent)') == 'cs_User_Agent_'
+    assert dt.sanitize_name('1foo--bar') == '_foo_bar'
+    assert dt.sanitize_name('caf\u00e9 \u2603') == 'caf_'
     with pytest.raises(ValueError):
         dt.sanitize_name('')
 
@@ -108,6 +116,9 @@ def test_path():
     assert dt.path('/foo').join(dt.path('bar/baz')) == dt.path('/foo/bar/baz')
     assert dt.path('/foo').join('/bar/baz') == dt.path('/bar/baz')
     assert dt.path('foo').join('/bar/baz') == dt.path('/bar/baz')
+    assert dt.path('/foo/bar.baz') is dt.path('/foo/bar.baz')
+    u = dt.url('/foo/bar.baz?quux')
+    assert u.path is u.path
 
 def test_url():
     assert dt.url('foo') == dt.Url('', '', 'foo', '', '', '')
@@ -115,6 +126,10 @@ def test_url():
     assert dt.url('http://foo/') == dt.Url('http', 'foo', '/', '', '', '')
     assert dt.url('http://foo/bar?baz=quux') == dt.Url('http', 'foo', '/bar', '', 'baz=quux', '')
     assert dt.url('https://foo/bar#baz') == dt.Url('https', 'foo', '/bar', '', '', 'baz')
+    assert dt.url('/foo/bar.htm') == dt.Url('', '', '/foo/bar.htm', '', '', '')
+    assert dt.url('/foo;bar') == dt.Url('', '', '/foo', 'bar', '', '')
+    assert dt.url('/foo?bar=baz#quux') == dt.Url('', '', '/foo', '', 'bar=baz', 'quux')
+    assert dt.url('/foo#bar?baz') == dt.Url('', '', '/foo', '', '', 'bar?baz')
     u = dt.url('http://localhost/foo/bar#baz')
     assert u.scheme == 'http'
     assert u.netloc == 'localhost'
@@ -127,6 +142,13 @@ def test_url():
     assert u.hostname == dt.hostname('localhost')
     assert u.hostname.address == dt.address('127.0.0.1')
 
+def test_url_str():
+    for s in (
+            'foo', '/foo/bar.htm', '/foo?bar=baz#quux', '/foo#bar?baz',
+            '/foo;bar', '//foo/bar', 'http://foo/bar?baz=quux',
+            'https://foo/bar#baz'):
+        assert str(dt.url(s)) == s
+
 def test_url_query():
     url = dt.url('http://foo/bar?baz=quux&x=1&y=')
     assert 'baz' in url.query
@@ -208,6 +230,15 @@ def test_hostname():
         dt.hostname('f'*64 + '.o')
     with pytest.raises(ValueError):
         dt.hostname('foo.bar.'*32 + '.com')
+    with pytest.raises(ValueError):
+        dt.hostname('foo.bar\n')
+    assert dt.hostname('foo-bar.example.com') == dt.Hostname('foo-bar.example.com')
+    with pytest.raises(ValueError) as exc:
+        dt.hostname('foo.-bar.com')
+    assert '-bar' in str(exc.value)
+    assert isinstance(dt.hostname('::1'), dt.IPv6Address)
+    assert isinstance(dt.hostname('10.0.0.1'), dt.IPv4Address)
+    assert isinstance(dt.hostname('host1'), dt.Hostname)
 
 def test_network_ipv4():
     assert dt.network('127.0.0.0/8') == dt.IPv4Network('127.0.0.0/8')
@@ -230,6 +261,10 @@ def test_address_ipv4():
         dt.address('google.com')
     with pytest.raises(ValueError):
         dt.address('127.0.0.1:100000')
+    assert dt.IPv4Port('127.0.0.1').port is None
+    assert dt.IPv4Port('127.0.0.1:8080').port == 8080
+    with pytest.raises(ValueError):
+        dt.IPv4Port('127.0.0.1:')
 
 def test_address_ipv6():
     assert dt.address('::1') == dt.IPv6Address('::1')
@@ -240,6 +275,8 @@ def test_address_ipv6():
     assert dt.address('[fe80::7334]:22') == dt.IPv6Port('[fe80::7334]:22')
     with pytest.raises(ValueError):
         dt.address('[::1]:100000')
+    with pytest.raises(ValueError):
+        dt.address('47::50f6]')
 
 def test_address_port_manipulation():
     addr = dt.address('127.0.0.1:80')
@@ -247,51 +284,51 @@ def test_address_port_manipulation():
     addr.port = None
     assert str(addr) == '127.0.0.1'
 
-def test_address_geoip_countries():
-    with mock.patch('lars.geoip._GEOIP_IPV4_GEO') as mock_db:
-        mock_db.country_code_by_addr.return_value = 'AA'
-        assert dt.address('127.0.0.1').country == 'AA'
-    with mock.patch('lars.geoip._GEOIP_IPV6_GEO') as mock_db:
-        mock_db.country_code_by_addr.return_value = 'BB'
-        assert dt.address('::1').country == 'BB'
-
-def test_address_geoip_cities():
-    with mock.patch('lars.geoip._GEOIP_IPV4_GEO') as mock_db:
-        mock_db.region_by_addr.return_value = {'region_name': 'AA'}
-        assert dt.address('127.0.0.1').region == 'AA'
-        mock_db.record_by_addr.return_value = {'city': 'Timbuktu'}
-        assert dt.address('127.0.0.1').city == 'Timbuktu'
-        mock_db.record_by_addr.return_value = {'longitude': 1, 'latitude': 2}
-        assert dt.address('127.0.0.1').coords == geoip.GeoCoord(1, 2)
-        mock_db.record_by_addr.return_value = None
-        assert dt.address('127.0.0.1').city is None
-        assert dt.address('127.0.0.1').coords is None
-    with mock.patch('lars.geoip._GEOIP_IPV6_GEO') as mock_db:
-        mock_db.region_by_addr.return_value = {'region_name': 'BB'}
-        assert dt.address('::1').region == 'BB'
-        mock_db.record_by_addr.return_value = {'city': 'Transylvania'}
-        assert dt.address('::1').city == 'Transylvania'
-        mock_db.record_by_addr.return_value = {'longitude': 3, 'latitude': 4}
-        assert dt.address('::1').coords == geoip.GeoCoord(3, 4)
-        mock_db.record_by_addr.return_value = None
-        assert dt.address('::1').city is None
-        assert dt.address('::1').coords is None
-
-def test_address_geoip_isp():
-    with mock.patch('lars.geoip._GEOIP_IPV4_ISP') as mock_db:
-        mock_db.org_by_addr.return_value = 'Internet 404'
-        assert dt.address('127.0.0.1').isp == 'Internet 404'
-    with mock.patch('lars.geoip._GEOIP_IPV6_ISP') as mock_db:
-        mock_db.org_by_addr.return_value = 'Internet 404'
-        assert dt.address('::1').isp == 'Internet 404'
-
-def test_address_geoip_org():
-    with mock.patch('lars.geoip._GEOIP_IPV4_ORG') as mock_db:
-        mock_db.org_by_addr.return_value = 'Acme Inc.'
-        assert dt.address('127.0.0.1').org == 'Acme Inc.'
-    with mock.patch('lars.geoip._GEOIP_IPV6_ORG') as mock_db:
-        mock_db.org_by_addr.return_value = 'Acme Inc.'
-        assert dt.address('::1').org == 'Acme Inc.'
+def test_address_geoip_countries(geoip_dbs):
+    mock_db = geoip_dbs['_GEOIP_IPV4_GEO']
+    mock_db.country_code_by_addr.return_value = 'AA'
+    assert V4_LOCAL.country == 'AA'
+    mock_db = geoip_dbs['_GEOIP_IPV6_GEO']
+    mock_db.country_code_by_addr.return_value = 'BB'
+    assert V6_LOCAL.country == 'BB'
+
+def test_address_geoip_cities(geoip_dbs):
+    mock_db = geoip_dbs['_GEOIP_IPV4_GEO']
+    mock_db.region_by_addr.return_value = {'region_name': 'AA'}
+    assert V4_LOCAL.region == 'AA'
+    mock_db.record_by_addr.side_effect = {
+        '127.0.0.1': {'city': 'Timbuktu', 'longitude': 1, 'latitude': 2},
+        }.get
+    assert V4_LOCAL.city == 'Timbuktu'
+    assert V4_LOCAL.coords == geoip.GeoCoord(1, 2)
+    assert dt.address('127.0.0.2').city is None
+    assert dt.address('127.0.0.2').coords is None
+    mock_db = geoip_dbs['_GEOIP_IPV6_GEO']
+    mock_db.region_by_addr.return_value = {'region_name': 'BB'}
+    assert V6_LOCAL.region == 'BB'
+    mock_db.record_by_addr.side_effect = {
+        '::1': {'city': 'Transylvania', 'longitude': 3, 'latitude': 4},
+        }.get
+    assert V6_LOCAL.city == 'Transylvania'
+    assert V6_LOCAL.coords == geoip.GeoCoord(3, 4)
+    assert dt.address('::2').city is None
+    assert dt.address('::2').coords is None
+
+def test_address_geoip_isp(geoip_dbs):
+    mock_db = geoip_dbs['_GEOIP_IPV4_ISP']
+    mock_db.org_by_addr.return_value = 'Internet 404'
+    assert V4_LOCAL.isp == 'Internet 404'
+    mock_db = geoip_dbs['_GEOIP_IPV6_ISP']
+    mock_db.org_by_addr.return_value = 'Internet 404'
+    assert V6_LOCAL.isp == 'Internet 404'
+
+def test_address_geoip_org(geoip_dbs):
+    mock_db = geoip_dbs['_GEOIP_IPV4_ORG']
+    mock_db.org_by_addr.return_value = 'Acme Inc.'
+    assert V4_LOCAL.org == 'Acme Inc.'
+    mock_db = geoip_dbs['_GEOIP_IPV6_ORG']
+    mock_db.org_by_addr.return_value = 'Acme Inc.'
+    assert V6_LOCAL.org == 'Acme Inc.'
 
 def test_resolving():
     assert dt.hostname('localhost').address == dt.IPv4Address('127.0.0.1')
@@ -300,13 +337,13 @@ def test_resolving():
     # things) but the values below work for vanilla Ubuntu hosts and Travis
     # CI's VMs
     assert dt.hostname('localhost').address.hostname in (
-            dt.hostname('localhost'),
-            dt.hostname('localhost.localdomain'),
+            dt.LOCALHOST,
+            dt.LOCALHOST_DOMAIN,
             )
     assert dt.hostname('test.invalid').address is None
     assert dt.address('127.0.0.1').hostname in (
-            dt.hostname('localhost'),
-            dt.hostname('localhost.localdomain'),
+            dt.LOCALHOST,
+            dt.LOCALHOST_DOMAIN,
             )
 
 def test_address():
@@ -316,6 +353,29 @@ def test_address():
         from_address.return_value = '::'
         assert dt.address('::').hostname is None
 
+def test_dns_cache_clear():
+    # Resolved names aren't kept by the (shared) address and hostname objects
+    # themselves so clearing the DNS caches forces fresh lookups
+    with mock.patch('lars.dns.socket.getnameinfo') as getnameinfo:
+        getnameinfo.return_value = ('foo.example.com', '0')
+        a = dt.address('192.0.2.1')
+        dns.from_address.cache_clear()
+        assert a.hostname == dt.Hostname('foo.example.com')
+        getnameinfo.return_value = ('bar.example.com', '0')
+        assert a.hostname == dt.Hostname('foo.example.com')
+        dns.from_address.cache_clear()
+        assert a.hostname == dt.Hostname('bar.example.com')
+    dns.from_address.cache_clear()
+    with mock.patch('lars.dns.socket.getaddrinfo') as getaddrinfo:
+        h = dt.Hostname('cached.example.com')
+        getaddrinfo.return_value = [(socket.AF_INET, 0, 0, '', ('192.0.2.1', 0))]
+        dns.to_address.cache_clear()
+        assert h.address == dt.address('192.0.2.1')
+        getaddrinfo.return_value = [(socket.AF_INET, 0, 0, '', ('192.0.2.2', 0))]
+        dns.to_address.cache_clear()
+        assert h.address == dt.address('192.0.2.2')
+    dns.to_address.cache_clear()
+
 def test_sqlite_adapters():
     pp = sqlite3.PrepareProtocol
     assert sqlite3.adapters[(dt.Date, pp)](dt.Date(2000, 1, 1)) == '2000-01-01'
@@ -329,3 +389,11 @@ def test_sqlite_converters():
     assert sqlite3.converters['TIMESTAMP'](b'2000-01-01 12:34:56') == dt.DateTime(2000, 1, 1, 12, 34, 56)
     assert sqlite3.converters['TIMESTAMP'](b'2000-01-01 12:34:56.000789') == dt.DateTime(2000, 1, 1, 12, 34, 56, 789)
 
+
+def test_hostname_pool():
+    h = dt.hostname('foo.bar')
+    assert dt.hostname('foo.bar') is h
+    assert dt.Hostname('foo.bar') is h
+    assert dt.hostname('foo.baz') is not h
+    assert dt.hostname('localhost') is dt.LOCALHOST
+    assert dt.hostname('localhost.localdomain') is dt.LOCALHOST_DOMAIN
@@ -37,26 +37,32 @@ import mock
 from lars import dns
 
 
-def test_from_address():
-    with mock.patch('tests.test_dns.dns.socket.getnameinfo') as getnameinfo:
-        getnameinfo.return_value = ('9.0.0.0', 0)
-        dns.from_address('9.0.0.0')
-        assert getnameinfo.called_with(('9.0.0.0', 0), 0)
-        getnameinfo.return_value = ('0.0.0.0', 0)
-        dns.from_address('0.0.0.0')
-        assert getnameinfo.called_with(('0.0.0.0', 0), 0)
-
-def test_to_address():
-    with mock.patch('tests.test_dns.dns.socket.getaddrinfo') as getaddrinfo:
-        getaddrinfo.return_value = [(socket.AF_INET, 0, 0, 0, ('127.0.0.1', 0))]
-        assert dns.to_address('localhost') == '127.0.0.1'
-        getaddrinfo.return_value = [(socket.AF_INET6, 0, 0, 0, ('::1', 0, 0, 0))]
-        assert dns.to_address('ip6-localhost') == '::1'
-        # Ensure IPv4 is always preferred over IPv6, if available
-        getaddrinfo.return_value = [
-            (socket.AF_INET6, 0, 0, 0, ('::1', 0, 0, 0)),
-            (socket.AF_INET6, 0, 0, 0, ('::2', 0, 0, 0)),
-            (socket.AF_INET, 0, 0, 0, ('127.0.0.1', 0)),
-            ]
-        assert dns.to_address('dualstack-localhost') == '127.0.0.1'
+def test_from_address(monkeypatch):
+    getnameinfo = mock.Mock()
+    monkeypatch.setattr(dns.socket, 'getnameinfo', getnameinfo)
+    dns.from_address.cache_clear()
+    getnameinfo.return_value = ('9.0.0.0', 0)
+    assert dns.from_address('9.0.0.0') == '9.0.0.0'
+    getnameinfo.assert_called_with(('9.0.0.0', 0), 0)
+    getnameinfo.return_value = ('0.0.0.0', 0)
+    assert dns.from_address('0.0.0.0') == '0.0.0.0'
+    getnameinfo.assert_called_with(('0.0.0.0', 0), 0)
+    getnameinfo.return_value = ('localhost', 0)
+    assert dns.from_address('::1') == 'localhost'
+    getnameinfo.assert_called_with(('::1', 0, 0, 0), 0)
 
+def test_to_address(monkeypatch):
+    getaddrinfo = mock.Mock()
+    monkeypatch.setattr(dns.socket, 'getaddrinfo', getaddrinfo)
+    dns.to_address.cache_clear()
+    getaddrinfo.return_value = [(socket.AF_INET, 0, 0, 0, ('127.0.0.1', 0))]
+    assert dns.to_address('localhost') == '127.0.0.1'
+    getaddrinfo.return_value = [(socket.AF_INET6, 0, 0, 0, ('::1', 0, 0, 0))]
+    assert dns.to_address('ip6-localhost') == '::1'
+    # Ensure IPv4 is always preferred over IPv6, if available
+    getaddrinfo.return_value = [
+        (socket.AF_INET6, 0, 0, 0, ('::1', 0, 0, 0)),
+        (socket.AF_INET6, 0, 0, 0, ('::2', 0, 0, 0)),
+        (socket.AF_INET, 0, 0, 0, ('127.0.0.1', 0)),
+        ]
+    assert dns.to_address('dualstack-localhost') == '127.0.0.1'
@@ -42,12 +42,13 @@ import pytest
 import mock
 
 from lars import geoip
+from lars.datatypes import IPv4Port, IPv6Port
 
 
-def test_init_db():
+def test_init_db(geoip_cache):
     with mock.patch('tests.test_geoip.geoip.pygeoip.GeoIP') as mock_class:
         geoip.init_databases('mock.dat')
-        assert mock_class.called_with('mock.dat', pygeoip.MEMORY_CACHE)
+        mock_class.assert_called_with('mock.dat', pygeoip.MEMORY_CACHE)
         # Ensure when the IPv6 database isn't initialized we get value errors
         # when requesting geoip info on IPv6 addresses
         # None, not errors (as the IPv6 database is optional)
@@ -85,60 +86,168 @@ def test_init_db():
             mock.call('isp_v6.dat', 0),
             mock.call('org_v6.dat', 0),
             ]
+        # Test memory-mapping takes precedence over memcache
+        mock_class.reset_mock()
+        geoip.init_databases('geo_v4.dat', mmap=True)
+        assert mock_class.mock_calls == [
+            mock.call('geo_v4.dat', pygeoip.MMAP_CACHE),
+            ]
 
-def test_countries():
-    with mock.patch('tests.test_geoip.geoip._GEOIP_IPV4_GEO') as mock_db:
-        geoip.country_code_by_addr(IPv4Address('127.0.0.1'))
-        assert mock_db.country_code_by_addr.called_with('127.0.0.1')
-    with mock.patch('tests.test_geoip.geoip._GEOIP_IPV6_GEO') as mock_db:
-        geoip.country_code_by_addr(IPv6Address('::1'))
-        assert mock_db.country_code_by_addr.called_with('::1')
+@pytest.mark.parametrize('version,addr', [
+    (4, IPv4Address('127.0.0.1')),
+    (6, IPv6Address('::1')),
+    ])
+@pytest.mark.parametrize('fn,db,method,value,expected', [
+    ('country_code_by_addr', 'GEO', 'country_code_by_addr', b'GB', 'GB'),
+    ('region_by_addr', 'GEO', 'region_by_addr', {'region_name': b'Essex'}, 'Essex'),
+    ('city_by_addr', 'GEO', 'record_by_addr', {'city': b'Colchester'}, 'Colchester'),
+    ('coords_by_addr', 'GEO', 'record_by_addr', {'longitude': 0.9, 'latitude': 51.9}, geoip.GeoCoord(0.9, 51.9)),
+    ('isp_by_addr', 'ISP', 'org_by_addr', b'Mime ISP', 'Mime ISP'),
+    ('org_by_addr', 'ORG', 'org_by_addr', b'Mime Consulting', 'Mime Consulting'),
+    ])
+def test_lookups(geoip_dbs, version, addr, fn, db, method, value, expected):
+    mock_db = geoip_dbs['_GEOIP_IPV%d_%s' % (version, db)]
+    getattr(mock_db, method).return_value = value
+    assert getattr(geoip, fn)(addr) == expected
+    getattr(mock_db, method).assert_called_once_with(addr.compressed)
 
-def test_regions():
-    with mock.patch('tests.test_geoip.geoip._GEOIP_IPV4_GEO') as mock_db:
-        geoip.region_by_addr(IPv4Address('127.0.0.1'))
-        assert mock_db.record_by_addr.called_with('127.0.0.1')
-    with mock.patch('tests.test_geoip.geoip._GEOIP_IPV6_GEO') as mock_db:
-        geoip.region_by_addr(IPv6Address('::1'))
-        assert mock_db.record_by_addr.called_with('::1')
+def test_interned(geoip_dbs):
+    mock_db = geoip_dbs['_GEOIP_IPV4_GEO']
+    mock_db.record_by_addr.side_effect = lambda addr: {
+        'city': b''.join((b'Tim', b'buktu'))}
+    city1 = geoip.city_by_addr(IPv4Address('127.0.0.1'))
+    city2 = geoip.city_by_addr(IPv4Address('127.0.0.2'))
+    assert city1 == 'Timbuktu'
+    assert city1 is city2
 
-def test_cities():
-    with mock.patch('tests.test_geoip.geoip._GEOIP_IPV4_GEO') as mock_db:
-        geoip.region_by_addr(IPv4Address('127.0.0.1'))
-        assert mock_db.region_by_addr.called_with('127.0.0.1')
-        geoip.city_by_addr(IPv4Address('127.0.0.1'))
-        assert mock_db.city_by_addr.called_with('127.0.0.1')
-        geoip.coords_by_addr(IPv4Address('127.0.0.1'))
-        assert mock_db.rec_by_addr.called_with('127.0.0.1')
-    with mock.patch('tests.test_geoip.geoip._GEOIP_IPV6_GEO') as mock_db:
-        geoip.region_by_addr(IPv6Address('::1'))
-        assert mock_db.region_by_addr.called_with('::1')
-        geoip.city_by_addr(IPv6Address('::1'))
-        assert mock_db.city_by_addr.called_with('::1')
-        geoip.coords_by_addr(IPv6Address('::1'))
-        assert mock_db.rec_by_addr.called_with('::1')
+def test_intern_pool(geoip_cache):
+    # The Python 2 fallback for intern() is a bounded pool
+    city1 = ''.join(('Tim', 'buktu'))
+    city2 = ''.join(('Tim', 'buktu'))
+    assert city1 is not city2
+    assert geoip._intern_pool(city1) is city1
+    assert geoip._intern_pool(city2) is city1
+    assert geoip._intern_pool.cache_info().maxsize is not None
+    geoip.close_databases()
+    assert geoip._intern_pool.cache_info().currsize == 0
 
-def test_coords():
-    with mock.patch('tests.test_geoip.geoip._GEOIP_IPV4_GEO') as mock_db:
-        geoip.coords_by_addr(IPv4Address('127.0.0.1'))
-        assert mock_db.record_by_addr.called_with('127.0.0.1')
-    with mock.patch('tests.test_geoip.geoip._GEOIP_IPV6_GEO') as mock_db:
-        geoip.coords_by_addr(IPv6Address('::1'))
-        assert mock_db.record_by_addr.called_with('::1')
+def test_lookup_cache(geoip_dbs):
+    mock_db = geoip_dbs['_GEOIP_IPV4_GEO']
+    mock_db.record_by_addr.return_value = {
+        'city': b'Colchester', 'longitude': 0.9, 'latitude': 51.9}
+    assert geoip.city_by_addr(IPv4Address('127.0.0.1')) == 'Colchester'
+    assert geoip.coords_by_addr(IPv4Address('127.0.0.1')) == geoip.GeoCoord(0.9, 51.9)
+    mock_db.record_by_addr.assert_called_once_with('127.0.0.1')
 
-def test_isp():
-    with mock.patch('tests.test_geoip.geoip._GEOIP_IPV4_ISP') as mock_db:
-        geoip.isp_by_addr(IPv4Address('127.0.0.1'))
-        assert mock_db.org_by_addr.called_with('127.0.0.1')
-    with mock.patch('tests.test_geoip.geoip._GEOIP_IPV6_ISP') as mock_db:
-        geoip.isp_by_addr(IPv6Address('::1'))
-        assert mock_db.org_by_addr.called_with('::1')
+def test_lookup_port(geoip_dbs):
+    # Addresses with ports are looked up by their bare address, regardless of
+    # whether the bare address was looked up (and cached) first
+    mock_db = geoip_dbs['_GEOIP_IPV4_GEO']
+    mock_db.country_code_by_addr.side_effect = {'1.2.3.4': b'GB'}.get
+    assert geoip.country_code_by_addr(IPv4Port('1.2.3.4:80')) == 'GB'
+    assert geoip.country_code_by_addr(IPv4Address('1.2.3.4')) == 'GB'
+    mock_db.country_code_by_addr.assert_called_once_with('1.2.3.4')
+    mock_db = geoip_dbs['_GEOIP_IPV6_GEO']
+    mock_db.country_code_by_addr.side_effect = {'::1': b'GB'}.get
+    assert geoip.country_code_by_addr(IPv6Port('[::1]:80')) == 'GB'
+    mock_db.country_code_by_addr.assert_called_once_with('::1')
+
+def test_mmdb(geoip_dbs):
+    # geoip_dbs ensures the databases initialized here are restored afterward
+    with mock.patch('lars.geoip.maxminddb') as mock_module:
+        reader = mock_module.open_database.return_value
+        reader.get.return_value = {
+            'city': {'names': {'en': 'Colchester'}},
+            'country': {'iso_code': 'GB'},
+            'location': {'longitude': 0.9, 'latitude': 51.9},
+            'subdivisions': [{'names': {'en': 'Essex'}}],
+            'isp': 'Mime ISP',
+            'organization': 'Mime Consulting',
+            }
+        geoip.init_databases('geo_v4.mmdb', 'isp_v4.mmdb', 'org_v4.mmdb')
+        mock_module.open_database.assert_called_with(
+            'org_v4.mmdb', mock_module.MODE_AUTO)
+        addr = IPv4Address('127.0.0.1')
+        assert geoip.country_code_by_addr(addr) == 'GB'
+        assert geoip.region_by_addr(addr) == 'Essex'
+        assert geoip.city_by_addr(addr) == 'Colchester'
+        assert geoip.coords_by_addr(addr) == geoip.GeoCoord(0.9, 51.9)
+        assert geoip.isp_by_addr(addr) == 'Mime ISP'
+        assert geoip.org_by_addr(addr) == 'Mime Consulting'
+        reader.get.assert_called_with('127.0.0.1')
+        # Test lookups which don't match anything
+        reader.get.return_value = None
+        addr = IPv4Address('127.0.0.2')
+        assert geoip.country_code_by_addr(addr) is None
+        assert geoip.region_by_addr(addr) is None
+        assert geoip.city_by_addr(addr) is None
+        assert geoip.coords_by_addr(addr) is None
+        assert geoip.isp_by_addr(addr) is None
+        assert geoip.org_by_addr(addr) is None
+        # Test records without a location
+        reader.get.return_value = {
+            'city': {'names': {'en': 'Colchester'}},
+            'country': {'iso_code': 'GB'},
+            }
+        addr = IPv4Address('127.0.0.3')
+        assert geoip.city_by_addr(addr) == 'Colchester'
+        assert geoip.coords_by_addr(addr) is None
+
+def test_reuse_databases(geoip_cache, tmpdir):
+    db_file = tmpdir.join('geo_v4.dat')
+    db_file.write('')
+    with mock.patch('tests.test_geoip.geoip.pygeoip.GeoIP') as mock_class:
+        geoip.init_databases(str(db_file))
+        geoip.init_databases(str(db_file))
+        assert mock_class.call_count == 1
+        # A different caching mode requires a separate instance
+        geoip.init_databases(str(db_file), mmap=True)
+        assert mock_class.call_count == 2
+        # As does a modification to the file
+        db_file.setmtime(db_file.mtime() + 10)
+        geoip.init_databases(str(db_file))
+        assert mock_class.call_count == 3
+        # Closing the databases forces them to be re-opened
+        geoip.close_databases()
+        assert geoip._GEOIP_IPV4_GEO is None
+        geoip.init_databases(str(db_file))
+        assert mock_class.call_count == 4
 
-def test_org():
-    with mock.patch('tests.test_geoip.geoip._GEOIP_IPV4_ORG') as mock_db:
-        geoip.org_by_addr(IPv4Address('127.0.0.1'))
-        assert mock_db.org_by_addr.called_with('127.0.0.1')
-    with mock.patch('tests.test_geoip.geoip._GEOIP_IPV6_ORG') as mock_db:
-        geoip.org_by_addr(IPv6Address('::1'))
-        assert mock_db.org_by_addr.called_with('::1')
+def test_close_databases(geoip_cache, tmpdir):
+    db_file = tmpdir.join('geo_v4.mmdb')
+    db_file.write('')
+    with mock.patch('lars.geoip.maxminddb') as mock_module:
+        mock_module.open_database.side_effect = lambda *args: mock.Mock()
+        # The same file opened for several databases is only closed once
+        geoip.init_databases(str(db_file), v6_geo_filename=str(db_file))
+        db = geoip._GEOIP_IPV4_GEO
+        assert geoip._GEOIP_IPV6_GEO is db
+        reader = db._reader
+        geoip.close_databases()
+        reader.close.assert_called_once_with()
+        # Re-opening after closing yields a fresh database (and reader)
+        geoip.init_databases(str(db_file))
+        assert geoip._GEOIP_IPV4_GEO is not db
+        assert geoip._GEOIP_IPV4_GEO._reader is not reader
+        assert not geoip._GEOIP_IPV4_GEO._reader.close.called
 
+def test_reload_modified_database(geoip_cache, tmpdir):
+    db_file = tmpdir.join('geo_v4.mmdb')
+    db_file.write('')
+    with mock.patch('lars.geoip.maxminddb') as mock_module:
+        mock_module.open_database.side_effect = lambda *args: mock.Mock()
+        geoip.init_databases(str(db_file), v6_geo_filename=str(db_file))
+        db = geoip._GEOIP_IPV4_GEO
+        # Modifying the file replaces the prior entry, but the prior database
+        # isn't closed while the IPv6 global still refers to it
+        db_file.setmtime(db_file.mtime() + 10)
+        geoip.init_databases(str(db_file))
+        assert len(geoip._DATABASES) == 1
+        assert geoip._GEOIP_IPV4_GEO is not db
+        assert geoip._GEOIP_IPV6_GEO is db
+        assert not db._reader.close.called
+        # Once nothing refers to it, the superseded database is closed
+        geoip.init_databases(v6_geo_filename=str(db_file))
+        assert len(geoip._DATABASES) == 1
+        assert geoip._GEOIP_IPV6_GEO is geoip._GEOIP_IPV4_GEO
+        db._reader.close.assert_called_once_with()
@@ -123,34 +123,54 @@ BAD_DATA_EXAMPLE_02 = """\
 2002-05-30 20:18:01 foo.bar
 """
 
+# Split each example into lines just once; tests pass IISSource a fresh
+# iterator over the shared tuple
+INTERNET_LINES = tuple(INTERNET_EXAMPLE.splitlines(True))
+INTRANET_LINES = tuple(INTRANET_EXAMPLE.splitlines(True))
+BAD_VERSION_LINES = tuple(BAD_VERSION.splitlines(True))
+MISSING_VERSION_LINES = tuple(MISSING_VERSION.splitlines(True))
+REPEAT_VERSION_LINES = tuple(REPEAT_VERSION.splitlines(True))
+REPEAT_FIELDS_LINES = tuple(REPEAT_FIELDS.splitlines(True))
+MISSING_FIELDS_LINES = tuple(MISSING_FIELDS.splitlines(True))
+DUPLICATE_FIELD_NAMES_LINES = tuple(DUPLICATE_FIELD_NAMES.splitlines(True))
+INVALID_DIRECTIVE_LINES = tuple(INVALID_DIRECTIVE.splitlines(True))
+BAD_DATA_01_LINES = tuple(BAD_DATA_EXAMPLE_01.splitlines(True))
+BAD_DATA_02_LINES = tuple(BAD_DATA_EXAMPLE_02.splitlines(True))
 
-def test_directive_regexes():
-    assert iis.IISSource.VERSION_RE.match('#Version: 1.0')
-    assert iis.IISSource.VERSION_RE.match('# VERSION : 1.0')
-    assert iis.IISSource.VERSION_RE.match('# version:100.99')
-    assert not iis.IISSource.VERSION_RE.match('#Version: foo')
-    assert iis.IISSource.START_DATE_RE.match('#Start-Date: 2000-01-01 00:00:00')
-    assert iis.IISSource.START_DATE_RE.match('# START-DATE : 2012-04-28 23:59:59')
-    assert iis.IISSource.START_DATE_RE.match('# start-date:1976-01-01 09:00:00')
-    assert not iis.IISSource.START_DATE_RE.match('#Start-Date: 2012-06-01')
-    assert iis.IISSource.END_DATE_RE.match('#End-Date: 2000-01-01 00:00:00')
-    assert iis.IISSource.END_DATE_RE.match('# END-DATE : 2012-04-28 23:59:59')
-    assert iis.IISSource.END_DATE_RE.match('# end-date:1976-01-01 09:00:00')
-    assert not iis.IISSource.END_DATE_RE.match('#End-Date: 2012-06-01')
-    assert iis.IISSource.DATE_RE.match('#Date: 2000-01-01 00:00:00')
-    assert iis.IISSource.DATE_RE.match('# DATE : 2012-04-28 23:59:59')
-    assert iis.IISSource.DATE_RE.match('# date:1976-01-01 09:00:00')
-    assert not iis.IISSource.DATE_RE.match('#Date: 2012-06-01')
-    assert iis.IISSource.SOFTWARE_RE.match('#Software: foo')
-    assert iis.IISSource.SOFTWARE_RE.match('# software : bar')
-    assert iis.IISSource.REMARK_RE.match('#Remark: bar')
-    assert iis.IISSource.REMARK_RE.match('# remark : bar')
-    assert iis.IISSource.FIELDS_RE.match('#Fields: foo cs-foo rs(foo)')
-    assert iis.IISSource.FIELDS_RE.match('# fields : x(bar) date time s-bar')
-    assert iis.IISSource.FIELD_RE.match('foo')
-    assert iis.IISSource.FIELD_RE.match('cs-foo')
-    assert iis.IISSource.FIELD_RE.match('rs(foo)')
-    assert iis.IISSource.FIELD_RE.match('x(bar)')
+
+@pytest.mark.parametrize('regex,text,matches', [
+    ('VERSION_RE', '#Version: 1.0', True),
+    ('VERSION_RE', '# VERSION : 1.0', True),
+    ('VERSION_RE', '# version:100.99', True),
+    ('VERSION_RE', '#Version: foo', False),
+    ('VERSION_RE', '#Version: \u0661.\u0660', False),
+    ('START_DATE_RE', '#Start-Date: 2000-01-01 00:00:00', True),
+    ('START_DATE_RE', '# START-DATE : 2012-04-28 23:59:59', True),
+    ('START_DATE_RE', '# start-date:1976-01-01 09:00:00', True),
+    ('START_DATE_RE', '#Start-Date: 2012-06-01', False),
+    ('END_DATE_RE', '#End-Date: 2000-01-01 00:00:00', True),
+    ('END_DATE_RE', '# END-DATE : 2012-04-28 23:59:59', True),
+    ('END_DATE_RE', '# end-date:1976-01-01 09:00:00', True),
+    ('END_DATE_RE', '#End-Date: 2012-06-01', False),
+    ('DATE_RE', '#Date: 2000-01-01 00:00:00', True),
+    ('DATE_RE', '# DATE : 2012-04-28 23:59:59', True),
+    ('DATE_RE', '# date:1976-01-01 09:00:00', True),
+    ('DATE_RE', '#Date: 2012-06-01', False),
+    ('SOFTWARE_RE', '#Software: foo', True),
+    ('SOFTWARE_RE', '# software : bar', True),
+    ('REMARK_RE', '#Remark: bar', True),
+    ('REMARK_RE', '# remark : bar', True),
+    ('FIELDS_RE', '#Fields: foo cs-foo rs(foo)', True),
+    ('FIELDS_RE', '# fields : x(bar) date time s-bar', True),
+    ('FIELD_RE', 'foo', True),
+    ('FIELD_RE', 'cs-foo', True),
+    ('FIELD_RE', 'rs(foo)', True),
+    ('FIELD_RE', 'x(bar)', True),
+    ])
+def test_directive_regexes(regex, text, matches):
+    assert bool(getattr(iis.IISSource, regex).match(text)) is matches
+
+def test_field_regex_prefix():
     # We can't deny invalid prefixes as the standard doesn't limit what
     # characters may appear in an identifier (and MS has already used the "-"
     # delimiter in several of their non-listed fields), so the best we can do
@@ -163,6 +183,8 @@ def test_string_parse():
     assert iis._string_parse('foo') == 'foo'
     assert iis._string_parse('foo+bar') == 'foo bar'
     assert iis._string_parse('%28foo+bar%29') == '(foo bar)'
+    assert iis._string_parse('100%25+sure') == '100% sure'
+    assert iis._string_parse('foo%2Bbar') == 'foo+bar'
     assert iis._string_parse('(foo;+bar;+baz)') == '(foo; bar; baz)'
     assert iis._string_parse('"foo"') == 'foo'
     assert iis._string_parse('"foo bar"') == 'foo bar'
@@ -179,7 +201,7 @@ def test_exceptions():
 
 def test_source_normal():
     # Test two normal runs with INTERNET_EXAMPLE and INTRANET_EXAMPLE
-    with iis.IISSource(INTERNET_EXAMPLE.splitlines(True)) as source:
+    with iis.IISSource(iter(INTERNET_LINES)) as source:
         row = None
         for count, row in enumerate(source):
             assert source.version == '1.0'
@@ -208,7 +230,7 @@ def test_source_normal():
             assert row.cs_Referrer == dt.url('http://64.224.24.114/')
         assert row
         assert count + 1 == source.count
-    with iis.IISSource(INTRANET_EXAMPLE.splitlines(True)) as source:
+    with iis.IISSource(iter(INTRANET_LINES)) as source:
         row = None
         for count, row in enumerate(source):
             assert source.fields == [
@@ -230,47 +252,74 @@ def test_source_normal():
         assert row
         assert count + 1 == source.count
 
+def test_source_shared_parser():
+    # Sources with identical #Fields directives share a generated row parser
+    with iis.IISSource(iter(INTRANET_LINES)) as source1:
+        row1 = next(iter(source1))
+    with iis.IISSource(iter(INTRANET_LINES)) as source2:
+        row2 = next(iter(source2))
+    assert source1._row_parser is source2._row_parser
+    assert type(row1) is type(row2)
+    assert row1 == row2
+
+def test_source_no_fields():
+    lines = [
+        '#Software: Microsoft Internet Information Services 6.0\n',
+        '#Version: 1.0\n',
+        '#Fields:\n',
+        ]
+    with iis.IISSource(iter(lines)) as source:
+        assert list(source) == []
+        assert source.fields == []
+
+def test_source_remark():
+    lines = ('#Version: 1.0\n', '# remark : Hello world\n')
+    with iis.IISSource(iter(lines)) as source:
+        for row in source:
+            pass
+        assert source.remark == 'Hello world'
+
 def test_source_invalid_headers():
     with pytest.raises(iis.IISVersionError):
-        with iis.IISSource(BAD_VERSION.splitlines(True)) as source:
+        with iis.IISSource(iter(BAD_VERSION_LINES)) as source:
             for row in source:
                 pass
     with pytest.raises(iis.IISVersionError):
-        with iis.IISSource(REPEAT_VERSION.splitlines(True)) as source:
+        with iis.IISSource(iter(REPEAT_VERSION_LINES)) as source:
             for row in source:
                 pass
     with pytest.raises(iis.IISVersionError):
-        with iis.IISSource(MISSING_VERSION.splitlines(True)) as source:
+        with iis.IISSource(iter(MISSING_VERSION_LINES)) as source:
             for row in source:
                 pass
     with pytest.raises(iis.IISFieldsError):
-        with iis.IISSource(REPEAT_FIELDS.splitlines(True)) as source:
+        with iis.IISSource(iter(REPEAT_FIELDS_LINES)) as source:
             for row in source:
                 pass
     with pytest.raises(iis.IISFieldsError):
-        with iis.IISSource(MISSING_FIELDS.splitlines(True)) as source:
+        with iis.IISSource(iter(MISSING_FIELDS_LINES)) as source:
             for row in source:
                 pass
     with pytest.raises(iis.IISFieldsError):
-        with iis.IISSource(DUPLICATE_FIELD_NAMES.splitlines(True)) as source:
+        with iis.IISSource(iter(DUPLICATE_FIELD_NAMES_LINES)) as source:
             for row in source:
                 pass
     with pytest.raises(iis.IISDirectiveError):
-        with iis.IISSource(INVALID_DIRECTIVE.splitlines(True)) as source:
+        with iis.IISSource(iter(INVALID_DIRECTIVE_LINES)) as source:
             for row in source:
                 pass
 
 def test_source_warnings(recwarn):
     # Test data warnings - in this first case the line regex won't pick up that
     # the IP address is invalid, but the data conversion routine will
-    with iis.IISSource(BAD_DATA_EXAMPLE_01.splitlines(True)) as source:
+    with iis.IISSource(iter(BAD_DATA_01_LINES)) as source:
         for row in source:
             pass
     assert recwarn.pop(iis.IISWarning)
     recwarn.clear()
     # In this second example, the bad IP address will result in the line
     # failing to even match the line regex
-    with iis.IISSource(BAD_DATA_EXAMPLE_02.splitlines(True)) as source:
+    with iis.IISSource(iter(BAD_DATA_02_LINES)) as source:
         for row in source:
             pass
     assert recwarn.pop(iis.IISWarning)
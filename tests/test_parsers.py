@@ -29,6 +29,7 @@ from __future__ import (
     division,
     )
 
+import re
 from datetime import datetime, date, time
 
 import pytest
@@ -42,6 +43,7 @@ str = type('')
 
 def test_url_parse():
     assert parsers.url_parse('-') is None
+    assert parsers.url_parse('/foo?bar') is parsers.url_parse('/foo?bar')
     assert parsers.url_parse('foo') == datatypes.Url('', '', 'foo', '', '', '')
     assert parsers.url_parse('//foo/bar') == datatypes.Url('', 'foo', '/bar', '', '', '')
     assert parsers.url_parse('http://foo/') == datatypes.Url('http', 'foo', '/', '', '', '')
@@ -50,12 +52,14 @@ def test_url_parse():
 
 def test_path_parse():
     assert parsers.path_parse('-') is None
+    assert parsers.path_parse('/foo/bar') is parsers.path_parse('/foo/bar')
     assert parsers.path_parse('/foo/bar/baz') == datatypes.Path('/foo/bar', 'baz', '')
     assert parsers.path_parse('/foo/bar.baz') == datatypes.Path('/foo', 'bar.baz', '.baz')
     assert parsers.path_parse('/foo/.baz') == datatypes.Path('/foo', '.baz', '')
 
 def test_request_parse():
     assert parsers.request_parse('-') is None
+    assert parsers.request_parse('GET / HTTP/1.1') is parsers.request_parse('GET / HTTP/1.1')
     assert parsers.request_parse('OPTIONS * HTTP/1.0') == datatypes.Request('OPTIONS', None, 'HTTP/1.0')
     assert parsers.request_parse('GET /foo/bar HTTP/1.1') == datatypes.Request('GET', datatypes.url('/foo/bar'), 'HTTP/1.1')
 
@@ -98,8 +102,27 @@ def test_time_parse():
     with pytest.raises(ValueError):
         parsers.time_parse('abc')
 
+def test_date_iso_parse():
+    assert parsers.date_iso_parse('-') is None
+    assert parsers.date_iso_parse('2000-01-01') == date(2000, 1, 1)
+    assert parsers.date_iso_parse('1986-02-28') == date(1986, 2, 28)
+    with pytest.raises(ValueError):
+        parsers.date_iso_parse('2000-01-32')
+    with pytest.raises(ValueError):
+        parsers.date_iso_parse('1986-02-29')
+
+def test_time_iso_parse():
+    assert parsers.time_iso_parse('-') is None
+    assert parsers.time_iso_parse('12:34:56') == time(12, 34, 56)
+    assert parsers.time_iso_parse('00:00:00') == time(0, 0, 0)
+    with pytest.raises(ValueError):
+        parsers.time_iso_parse('25:00:30')
+    with pytest.raises(ValueError):
+        parsers.time_iso_parse('12:60:00')
+
 def test_hostname_parse():
     assert parsers.hostname_parse('-') is None
+    assert parsers.hostname_parse('127.0.0.1') is parsers.hostname_parse('127.0.0.1')
     assert parsers.hostname_parse('foo') == 'foo'
     assert parsers.hostname_parse('foo.bar') == 'foo.bar'
     assert str(parsers.hostname_parse('127.0.0.1')) == '127.0.0.1'
@@ -129,6 +152,13 @@ def test_address_parse():
     assert str(parsers.address_parse('2001:0db8:85a3:0000:0000:8a2e:0370:7334')) == '2001:db8:85a3::8a2e:370:7334'
     assert str(parsers.address_parse('[2001:0db8:85a3:0000:0000:8a2e:0370:7334]:22')) == '[2001:db8:85a3::8a2e:370:7334]:22'
     assert str(parsers.address_parse('[fe80::7334]:22')) == '[fe80::7334]:22'
+    assert parsers.address_parse('127.0.0.1') is parsers.address_parse('127.0.0.1')
+    addr = parsers.address_parse('10.0.0.1:80')
+    addr.port = None
+    assert parsers.address_parse('10.0.0.1:80').port == 80
+    addr = parsers.address_parse('[::1]:80')
+    addr.port = None
+    assert parsers.address_parse('[::1]:80').port == 80
     with pytest.raises(ValueError):
         parsers.address_parse('abc')
     with pytest.raises(ValueError):
@@ -138,3 +168,25 @@ def test_address_parse():
     with pytest.raises(ValueError):
         parsers.address_parse('[::1]:100000')
 
+
+def test_row_parser():
+    regex = re.compile(
+        '^' + parsers.INTEGER % {'name': 'a'} + ' ' +
+        parsers.FIXED % {'name': 'b'} + ' (?P<c>.*)$')
+    names = ('a', 'b', 'c')
+    funcs = (parsers.int_parse, parsers.fixed_parse, None)
+    groups = tuple(regex.groupindex[name] for name in names)
+    row_type, parse = parsers.row_parser(names, funcs, groups)
+    assert row_type._fields == names
+    assert parse(regex.match('1 2.5 foo bar')) == row_type(1, 2.5, 'foo bar')
+    assert parse(regex.match('- - -')) == row_type(None, None, '-')
+    assert parsers.row_parser(names, funcs, groups) == (row_type, parse)
+    row = parse(regex.match('1 2.5 foo'))
+    assert isinstance(row, row_type)
+    assert row.a == 1
+    # Single field rows must still produce a tuple
+    row_type, parse = parsers.row_parser(('c',), (None,), (1,))
+    assert parse(re.match('(.*)', 'foo')) == row_type('foo')
+    # As must rows with no fields at all
+    row_type, parse = parsers.row_parser((), (), ())
+    assert parse(re.match('foo', 'foo')) == row_type()